@@ -0,0 +1,104 @@
+import threading
+import time
+
+# Defaults for GameEngine's autosave
+AUTOSAVE_SLOTS = 3  # autosave_1.json ... autosave_3.json, reused oldest first
+AUTOSAVE_EVERY_TURNS = 100
+# Longest share of the game thread's time autosave may take. Only the snapshot
+# runs there (the file is written on a background thread), and after each
+# snapshot further autosaves wait until its cost is within this share.
+AUTOSAVE_MAX_FRAME_SHARE = 0.05
+
+class Autosaver:
+    """Rolling autosave for a GameEngine.
+    Saves are requested on level changes and every few turns, then taken by
+    poll() from the game loop: the engine state is snapshotted on the game
+    thread and written to the next slot of a small ring on a background thread.
+    A save that comes due while the previous one is still being written is
+    skipped rather than queued."""
+    def __init__(self, game_engine, slots=AUTOSAVE_SLOTS, every_turns=AUTOSAVE_EVERY_TURNS,
+                 max_frame_share=AUTOSAVE_MAX_FRAME_SHARE, clock=time.perf_counter):
+        self.game_engine = game_engine
+        self.slots = slots
+        self.every_turns = every_turns
+        self.max_frame_share = max_frame_share
+        self.clock = clock
+        self.turns = 0
+        self.pending = None  # reason for the requested save, e.g. "level"
+        self.worker = None
+        self.result = None  # (success, message) from the last finished write
+        self.not_before = 0  # rate limit from the cost of the last snapshot
+        self.last_snapshot_time = 0
+        self.saves = 0
+        self.skipped = 0
+    
+    @property
+    def enabled(self):
+        return self.slots > 0
+    
+    @property
+    def in_flight(self):
+        return self.worker is not None and self.worker.is_alive()
+    
+    def slot_names(self):
+        return [f"autosave_{slot}" for slot in range(1, self.slots + 1)]
+    
+    def next_slot(self):
+        """The slot to overwrite next: the first unused one, else the oldest"""
+        stamps = self.game_engine.save_manager.save_stamps()
+        return min(self.slot_names(), key=lambda slot_name: stamps.get(slot_name + '.json', -1))
+    
+    def note_turn(self):
+        """Count a game turn; requests a save every every_turns turns"""
+        self.turns += 1
+        if self.every_turns and self.turns % self.every_turns == 0:
+            self.request("turns")
+    
+    def request(self, reason):
+        if not self.enabled:
+            return
+        if self.in_flight:
+            self.skipped += 1
+            return
+        self.pending = reason
+    
+    def poll(self):
+        """Call from the game loop. Takes a requested save once the frame-time
+        budget allows and reports a failed write. Returns True if a save started."""
+        if self.result is not None and not self.in_flight:
+            success, message = self.result
+            self.result = None
+            if not success:
+                self.game_engine.add_message(f"Autosave failed: {message}")
+        
+        if self.pending is None or self.game_engine.game_state != "playing":
+            return False
+        if self.in_flight:
+            self.pending = None
+            self.skipped += 1
+            return False
+        now = self.clock()
+        if now < self.not_before:
+            return False
+        
+        self.pending = None
+        save_manager = self.game_engine.save_manager
+        self.game_engine.update_playtime()
+        save_data = save_manager.build_save_data(self.game_engine, "Autosave")
+        filepath = save_manager.slot_path(self.next_slot())
+        self.last_snapshot_time = self.clock() - now
+        self.not_before = now + self.last_snapshot_time / self.max_frame_share
+        
+        self.worker = threading.Thread(target=self._write, args=(save_manager, filepath, save_data),
+                                       name="autosave")
+        self.worker.start()
+        self.saves += 1
+        return True
+    
+    def _write(self, save_manager, filepath, save_data):
+        self.result = save_manager.write_save(filepath, save_data)
+    
+    def wait(self, timeout=None):
+        """Block until the save being written (if any) is on disk"""
+        if self.worker is not None:
+            self.worker.join(timeout)
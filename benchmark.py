@@ -0,0 +1,122 @@
+"""
+Performance benchmarks for the roguelike.
+Runs every registered level generator at a few map sizes and checks the
+median generation time against the generator's budget, and checks that
+importing main_gui stays within the start-up import budget.
+
+Recorded replays (see replay.py) given on the command line are played back
+headlessly as extra workloads, reporting per-command times.
+
+Usage: python benchmark.py [runs] [RUN.replay ...]
+       python benchmark.py --startup   only the start-up import check (a few seconds)
+Exits with status 1 if any budget is exceeded.
+"""
+
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from level_generators import GENERATORS
+
+# Map sizes the generator budgets are checked at
+GENERATOR_SIZES = [(80, 50), (200, 120)]
+GENERATOR_DEPTHS = [1, 12, 30]
+
+# Start-up budget for `import main_gui`; heavy modules must load after the first paint
+IMPORT_BUDGET_MS = 150
+STARTUP_MODULE = 'main_gui'
+STARTUP_DEFERRED_MODULES = ['pygame', 'numpy', 'game_engine', 'save_load_dialog']
+
+def benchmark_generators(runs=5):
+    """Time every generator; returns a list of (name, size, ms_per_10k_cells, budget_ms)"""
+    results = []
+    for name, entry in GENERATORS.items():
+        for width, height in GENERATOR_SIZES:
+            timings = []
+            for run in range(runs):
+                for depth in GENERATOR_DEPTHS:
+                    random.seed(run * 1000 + depth)
+                    start = time.perf_counter()
+                    entry['generate'](width, height, depth)
+                    timings.append(time.perf_counter() - start)
+            ms_per_10k = statistics.median(timings) * 1000 / (width * height / 10000)
+            results.append((name, (width, height), ms_per_10k, entry['budget_ms']))
+    return results
+
+def measure_import_time(module, runs=3):
+    """Best-of-runs cumulative import time (ms) of module in a fresh interpreter,
+    plus the set of modules that import pulled in"""
+    best = None
+    imported = set()
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        cumulative = None
+        for line in result.stderr.splitlines():
+            parts = line.split('|')
+            if len(parts) != 3 or not parts[1].strip().isdigit():
+                continue
+            name = parts[2].strip()
+            imported.add(name)
+            if name == module:
+                cumulative = int(parts[1]) / 1000
+        if cumulative is None:
+            raise RuntimeError(f"Could not import {module}:\n{result.stderr}")
+        best = cumulative if best is None else min(best, cumulative)
+    return best, imported
+
+def benchmark_replays(paths):
+    """Play each replay; returns a list of (path, commands, total_ms, p95_ms, slowest_step, slowest_ms)"""
+    from replay import play_replay
+    results = []
+    for path in paths:
+        _, timings = play_replay(path)
+        if not timings:
+            continue
+        ordered = sorted(timings)
+        slowest = max(range(len(timings)), key=timings.__getitem__)
+        results.append((path, len(timings), sum(timings) * 1000,
+                        ordered[int(len(ordered) * 0.95)] * 1000, slowest + 1, timings[slowest] * 1000))
+    return results
+
+def check_startup():
+    """Print the start-up import check; returns True if it is within budget"""
+    import_ms, imported = measure_import_time(STARTUP_MODULE)
+    eager = [name for name in STARTUP_DEFERRED_MODULES if name in imported]
+    status = "ok" if import_ms <= IMPORT_BUDGET_MS and not eager else "OVER BUDGET"
+    print(f"Start-up import of {STARTUP_MODULE}: {import_ms:.1f} ms  (budget {IMPORT_BUDGET_MS} ms)  {status}")
+    if eager:
+        print(f"  imported too early: {', '.join(eager)}")
+    return status == "ok"
+
+def main():
+    args = sys.argv[1:]
+    if args == ['--startup']:
+        return 0 if check_startup() else 1
+    runs = int(args.pop(0)) if args and args[0].isdigit() else 5
+    failed = False
+    
+    print("Level generators (median ms per 10,000 cells):")
+    for name, (width, height), ms_per_10k, budget_ms in benchmark_generators(runs):
+        status = "ok" if ms_per_10k <= budget_ms else "OVER BUDGET"
+        failed = failed or ms_per_10k > budget_ms
+        size = f"{width}x{height}"
+        print(f"  {name:<10} {size:<9} {ms_per_10k:7.2f} ms  (budget {budget_ms} ms)  {status}")
+    
+    print()
+    failed = not check_startup() or failed
+    
+    if args:
+        print("\nReplays:")
+        for path, commands, total_ms, p95_ms, slowest_step, slowest_ms in benchmark_replays(args):
+            print(f"  {path}: {commands} commands in {total_ms:.0f} ms  "
+                  f"p95 {p95_ms:.2f} ms  slowest #{slowest_step} {slowest_ms:.2f} ms")
+    
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
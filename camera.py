@@ -0,0 +1,75 @@
+import pygame
+
+# Tile sizes (in pixels) the viewport can be zoomed between
+ZOOM_LEVELS = [8, 12, 16, 20, 24]
+
+class Camera:
+    """Tracks which window of map tiles is shown in the viewport"""
+    def __init__(self, view_width, view_height, map_width, map_height):
+        # Viewport size in tiles
+        self.width = view_width
+        self.height = view_height
+        self.map_width = map_width
+        self.map_height = map_height
+        # Map coordinates of the top-left tile of the viewport
+        self.x = 0
+        self.y = 0
+
+    def resize(self, view_width, view_height):
+        """Change the number of tiles that fit in the viewport"""
+        self.width = max(1, view_width)
+        self.height = max(1, view_height)
+
+    def set_map_size(self, map_width, map_height):
+        self.map_width = map_width
+        self.map_height = map_height
+
+    def center_on(self, x, y):
+        """Scroll so that (x, y) is centered, without showing space past the map edges"""
+        self.x = self._clamp(x - self.width // 2, self.width, self.map_width)
+        self.y = self._clamp(y - self.height // 2, self.height, self.map_height)
+
+    def _clamp(self, offset, view_size, map_size):
+        if map_size <= view_size:
+            # Map fits entirely - center it in the viewport
+            return -((view_size - map_size) // 2)
+        return max(0, min(offset, map_size - view_size))
+
+    def visible_bounds(self):
+        """Get (x0, y0, x1, y1) of the map tiles inside the viewport, clipped to the map"""
+        x0 = max(0, self.x)
+        y0 = max(0, self.y)
+        x1 = min(self.map_width, self.x + self.width)
+        y1 = min(self.map_height, self.y + self.height)
+        return x0, y0, x1, y1
+
+    def in_view(self, x, y):
+        return self.x <= x < self.x + self.width and self.y <= y < self.y + self.height
+
+    def to_view(self, x, y):
+        """Convert map coordinates to viewport tile coordinates"""
+        return x - self.x, y - self.y
+
+    def to_map(self, view_x, view_y):
+        """Convert viewport tile coordinates to map coordinates"""
+        return view_x + self.x, view_y + self.y
+
+class GlyphCache:
+    """Pre-rendered glyph surfaces for every tile size the camera is zoomed to"""
+    def __init__(self):
+        self.fonts = {}
+        self.glyphs = {}
+
+    def get(self, char, color, tile_size):
+        if type(color) is list:  # colors restored from JSON saves
+            color = tuple(color)
+        key = (char, color, tile_size)
+        glyph = self.glyphs.get(key)
+        if glyph is None:
+            font = self.fonts.get(tile_size)
+            if font is None:
+                font = pygame.font.Font(None, tile_size)
+                self.fonts[tile_size] = font
+            glyph = font.render(char, True, color)
+            self.glyphs[key] = glyph
+        return glyph
@@ -0,0 +1,37 @@
+"""
+Cell encoding shared by the session host and the spectator stream.
+
+Both send a client the tile ids of the cells the player has explored, as
+column-major bytes like GameMap's, and then only the cells that changed.
+"""
+
+import base64
+import re
+import zlib
+
+UNKNOWN_CELL = 255  # tile id sent for cells the player hasn't explored
+
+def pack_cells(cells):
+    """Compress per-cell bytes into a JSON-safe string"""
+    return base64.b64encode(zlib.compress(bytes(cells))).decode('ascii')
+
+def unpack_cells(text):
+    return bytearray(zlib.decompress(base64.b64decode(text)))
+
+def known_cells(game_map):
+    """Tile ids of explored cells, UNKNOWN_CELL elsewhere (column-major like GameMap)"""
+    count = len(game_map.tile_types)
+    # 0xff for explored cells, 0x00 elsewhere - combined with big-integer ops
+    mask = int.from_bytes(game_map.explored.translate(bytes([0]) + b'\xff' * 255), 'big')
+    everything = int.from_bytes(b'\xff' * count, 'big')
+    known = (int.from_bytes(game_map.tile_types, 'big') & mask) | (everything ^ mask)
+    return known.to_bytes(count, 'big')
+
+NONZERO = re.compile(b'[^\x00]')
+
+def changed_cells(old, new):
+    """Indices where two equally long cell arrays differ.
+    The arrays are XORed as big integers and the non-zero bytes found by a
+    regex scan, so the Python-level work grows with the changes, not the map."""
+    diff = (int.from_bytes(old, 'big') ^ int.from_bytes(new, 'big')).to_bytes(len(new), 'big')
+    return [match.start() for match in NONZERO.finditer(diff)]
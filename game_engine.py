@@ -1,47 +1,103 @@
 import pygame
+import random
 import sys
 import time
+from contextlib import nullcontext
+from autosave import Autosaver, AUTOSAVE_SLOTS
+from camera import Camera, GlyphCache, ZOOM_LEVELS
+from enemy_table import batch_enemy_turns
 from game_entities import Player
-from game_map import generate_dungeon, calculate_fov
+from game_map import generate_dungeon, calculate_fov, TILE_TYPES
+from game_state_model import GameStateModel
+from level_archive import LevelArchive
 from level_manager import LevelManager
-from save_manager import SaveManager
+from message_log import MessageLog
+from pathfinding import PathCache
+
+# Default viewport size in pixels - the back buffer never depends on the map size
+DEFAULT_VIEW_WIDTH = 960
+DEFAULT_VIEW_HEIGHT = 600
+
+# Movement keys -> (dx, dy); yubn are the roguelike diagonals
+MOVEMENT_KEYS = {
+    pygame.K_UP: (0, -1), pygame.K_k: (0, -1),
+    pygame.K_DOWN: (0, 1), pygame.K_j: (0, 1),
+    pygame.K_LEFT: (-1, 0), pygame.K_h: (-1, 0),
+    pygame.K_RIGHT: (1, 0), pygame.K_l: (1, 0),
+    pygame.K_y: (-1, -1), pygame.K_u: (1, -1),
+    pygame.K_b: (-1, 1), pygame.K_n: (1, 1),
+}
 
 class GameEngine:
-    def __init__(self, width=80, height=50):
+    def __init__(self, width=80, height=50, view_width=DEFAULT_VIEW_WIDTH, view_height=DEFAULT_VIEW_HEIGHT,
+                 autosave_slots=AUTOSAVE_SLOTS, seed=None, replay_path=None, headless=False, level_pack=None):
         # Don't initialize pygame here, it should be initialized before creating this class
         self.map_width = width
         self.map_height = height
         self.tile_size = 12
-        self.screen_width = width * self.tile_size
-        self.screen_height = height * self.tile_size
+        self.screen_width = view_width
+        self.screen_height = view_height
         
-        self.screen = pygame.Surface((self.screen_width, self.screen_height))
+        # Fixed-size back buffer; the camera picks which tiles land in it.
+        # Headless engines (bots, session hosts) never render and skip it.
+        self.headless = headless
+        self.screen = None if headless else pygame.Surface((self.screen_width, self.screen_height))
+        self.camera = Camera(view_width // self.tile_size, view_height // self.tile_size, width, height)
+        self.glyphs = GlyphCache()
         self.clock = pygame.time.Clock()
-        self.font = pygame.font.Font(None, self.tile_size)
         
         # Game state
         self.player = None
         self.game_map = None
         self.dungeon_level = 1
-        self.game_messages = []
+        self.message_log = MessageLog()
         self.game_state = "playing"  # "playing", "dead", "won"
-        self.level_manager = LevelManager()
-        self.save_manager = SaveManager()
+        self.level_manager = LevelManager(level_pack)  # level_pack: see LevelManager
+        self._save_manager = None  # created on first save/load (touches the filesystem)
+        self.quick_save_slot = "quicksave"  # None turns Ctrl+S off (e.g. hosted sessions)
+        self.autosave = Autosaver(self, slots=autosave_slots)  # 0 slots disables autosave
         self.start_time = time.time()
         self.playtime = 0
+        self.turns = 0  # player turns taken this run
+        self.paths = PathCache()  # cached distance fields for travel/auto-explore
+        self.levels = LevelArchive()  # levels left behind, restored when revisited
+        # Observable copy of the values the UI shows (see publish_state)
+        self.state = GameStateModel()
         
+        # Everything random in a run comes from this seed, so the seed plus the
+        # commands passed to execute() reproduce the run (see replay.py)
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        random.seed(self.seed)
+        self.recorder = None
+        self.spectator = None  # SpectatorStream fed after every turn (see spectator.py)
+        self.watchdog = None  # TurnWatchdog profiling slow commands, renders and saves (see turn_watchdog.py)
+        if replay_path:
+            from replay import ReplayRecorder
+            self.recorder = ReplayRecorder(replay_path, self.seed, width, height,
+                                           self.level_manager.level_pack_path)
+        
+        if self.level_manager.pack_error:
+            self.add_message(self.level_manager.pack_error)
         self.initialize_game()
+        self.publish_state()
     
-    def initialize_game(self):
-        # Use level manager to generate level with guaranteed exits
-        self.game_map = self.level_manager.generate_level_with_guaranteed_exits(
-            self.map_width, self.map_height, self.dungeon_level)
+    def initialize_game(self, climbing=False):
+        # Visited levels come back from the archive as they were left
+        self.game_map = self.levels.load(self.dungeon_level)
+        revisit = self.game_map is not None
+        if not revisit:
+            # From the level pack if there is one, else generated with guaranteed exits
+            self.game_map = self.level_manager.new_level(self.map_width, self.map_height, self.dungeon_level)
         
-        # Place player in first room
-        if self.game_map.rooms:
-            first_room = self.game_map.rooms[0]
-            player_x = first_room.center_x
-            player_y = first_room.center_y
+        # Place player at the level's spawn point (center of the first room).
+        # Visited levels put the player back on the stairs they arrive by
+        # (a loaded level may not know its spawn point).
+        if revisit and climbing and self.game_map.stairs_down:
+            player_x, player_y = self.game_map.stairs_down
+        elif revisit and not climbing and self.game_map.stairs_up:
+            player_x, player_y = self.game_map.stairs_up
+        elif self.game_map.spawn:
+            player_x, player_y = self.game_map.spawn
         else:
             player_x, player_y = self.map_width // 2, self.map_height // 2
         
@@ -61,6 +117,9 @@ class GameEngine:
         description = self.level_manager.get_level_description(self.dungeon_level)
         
         self.add_message(f"=== {theme} - Level {self.dungeon_level} ===")
+        if revisit:
+            self.add_message("You return to familiar ground.")
+            return
         self.add_message(description)
         
         # Show level progression info
@@ -78,34 +137,51 @@ class GameEngine:
         if features.get('rest_area'):
             self.add_message("This place feels safe and peaceful.")
     
+    def leave_level(self):
+        """Archive the current level before moving to another one"""
+        self.levels.store(self.game_map)
+    
     def add_message(self, message):
-        self.game_messages.append(message)
-        if len(self.game_messages) > 10:  # Keep only last 10 messages
-            self.game_messages.pop(0)
+        self.message_log.add(message)
+    
+    def watched(self, label, command=None):
+        """Context for a call the watchdog times (a no-op without a watchdog)"""
+        if self.watchdog is None:
+            return nullcontext()
+        return self.watchdog.watch(self, label, command)
     
-    def handle_input(self, key):
+    def execute(self, command):
+        """Run one input command: ('key', key), ('ctrl', key) for a key pressed
+        with Ctrl held, ('run', key) or ('travel', (x, y))"""
+        if self.recorder is not None:
+            self.recorder.record(command)
+        kind, arg = command
+        with self.watched('input', command):
+            if kind == 'run':
+                self.run(arg)
+            elif kind == 'travel':
+                self.travel_to(*arg)
+            else:
+                self.handle_input(arg, ctrl=kind == 'ctrl')
+    
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+    
+    def handle_input(self, key, ctrl=False):
+        self._handle_key(key, ctrl)
+        self.publish_state()
+    
+    def _handle_key(self, key, ctrl=False):
         if self.game_state != "playing":
             return
         
         dx, dy = 0, 0
         
         # Movement keys
-        if key == pygame.K_UP or key == pygame.K_k:
-            dy = -1
-        elif key == pygame.K_DOWN or key == pygame.K_j:
-            dy = 1
-        elif key == pygame.K_LEFT or key == pygame.K_h:
-            dx = -1
-        elif key == pygame.K_RIGHT or key == pygame.K_l:
-            dx = 1
-        elif key == pygame.K_y:  # diagonal up-left
-            dx, dy = -1, -1
-        elif key == pygame.K_u:  # diagonal up-right
-            dx, dy = 1, -1
-        elif key == pygame.K_b:  # diagonal down-left
-            dx, dy = -1, 1
-        elif key == pygame.K_n:  # diagonal down-right
-            dx, dy = 1, 1
+        if key in MOVEMENT_KEYS:
+            dx, dy = MOVEMENT_KEYS[key]
         elif key == pygame.K_PERIOD:  # wait/rest
             self.player_turn()
             return
@@ -121,13 +197,123 @@ class GameEngine:
         elif key == pygame.K_p:  # use special portal
             self.use_special_portal()
             return
-        elif key == pygame.K_s and pygame.key.get_pressed()[pygame.K_LCTRL]:  # Ctrl+S to save
+        elif key == pygame.K_x:  # auto-explore
+            self.auto_explore()
+            return
+        elif key == pygame.K_GREATER:  # travel to stairs down
+            self.travel_to_feature(self.game_map.stairs_down, "stairs down")
+            return
+        elif key == pygame.K_LESS:  # travel to stairs up
+            self.travel_to_feature(self.game_map.stairs_up, "stairs up")
+            return
+        elif key == pygame.K_g:  # travel to the magic portal
+            self.travel_to_feature(self.game_map.special_portal, "portal")
+            return
+        elif key == pygame.K_s and ctrl:  # Ctrl+S to save
             self.quick_save()
             return
+        elif key == pygame.K_PLUS or key == pygame.K_EQUALS:  # zoom in (no turn taken)
+            self.zoom(1)
+            return
+        elif key == pygame.K_MINUS:  # zoom out (no turn taken)
+            self.zoom(-1)
+            return
         
         if dx != 0 or dy != 0:
             self.move_player(dx, dy)
     
+    def run(self, key, max_steps=100):
+        """Keep moving in a direction until something interesting happens.
+        All steps run back to back; the caller repaints once afterwards."""
+        if self.game_state != "playing" or key not in MOVEMENT_KEYS:
+            return 0
+        dx, dy = MOVEMENT_KEYS[key]
+        steps = 0
+        while steps < max_steps and self.game_state == "playing":
+            new_x, new_y = self.player.x + dx, self.player.y + dy
+            # Never run into a wall or an attack
+            if not self.game_map.is_walkable(new_x, new_y) or self.enemy_at(new_x, new_y):
+                break
+            hp = self.player.hp
+            self.move_player(dx, dy)
+            steps += 1
+            if self.player.hp < hp or self.enemy_in_view() or self.something_underfoot():
+                break
+        if steps == 0:
+            self.add_message("You can't run that way.")
+        self.publish_state()
+        return steps
+    
+    def auto_explore(self, max_steps=200):
+        """Walk towards the nearest unexplored area until interrupted"""
+        if not self._can_travel():
+            return 0
+        if self.paths.frontier_field(self.game_map) is None:
+            self.add_message("Nothing left to explore here.")
+            return 0
+        return self._follow_field(lambda: self.paths.frontier_field(self.game_map), max_steps)
+    
+    def travel_to(self, x, y, max_steps=500):
+        """Walk to an explored tile along the shortest known path"""
+        if not self._can_travel():
+            return 0
+        if (x, y) == (self.player.x, self.player.y):
+            return 0
+        if self.paths.field_to(self.game_map, x, y) is None:
+            self.add_message("You don't know a way there.")
+            return 0
+        return self._follow_field(lambda: self.paths.field_to(self.game_map, x, y), max_steps)
+    
+    def travel_to_feature(self, position, name):
+        tile = self.game_map.get_tile(*position) if position else None
+        if tile is None or not tile.explored:
+            self.add_message(f"You haven't found the {name} yet.")
+            return 0
+        return self.travel_to(*position)
+    
+    def _can_travel(self):
+        if self.game_state != "playing":
+            return False
+        if self.enemy_in_view():
+            self.add_message("Not with enemies in view!")
+            self.publish_state()
+            return False
+        return True
+    
+    def _follow_field(self, get_field, max_steps):
+        """Step downhill on a distance field (fetched from the path cache each
+        step) until arrival, or until something interrupts the walk"""
+        steps = 0
+        while steps < max_steps and self.game_state == "playing":
+            field = get_field()
+            step = self.paths.next_step(self.game_map, field, self.player.x, self.player.y) if field else None
+            if step is None or self.enemy_at(self.player.x + step[0], self.player.y + step[1]):
+                break
+            hp = self.player.hp
+            self.move_player(*step)
+            steps += 1
+            if self.player.hp < hp or self.enemy_in_view() or self.something_underfoot():
+                break
+        self.publish_state()
+        return steps
+    
+    def enemy_at(self, x, y):
+        for enemy in self.game_map.enemies:
+            if enemy.x == x and enemy.y == y:
+                return enemy
+        return None
+    
+    def enemy_in_view(self):
+        visible, height = self.game_map.visible, self.game_map.height
+        return any(visible[enemy.x * height + enemy.y] for enemy in self.game_map.enemies)
+    
+    def something_underfoot(self):
+        """True if the player stands on an item, stairs or a portal"""
+        position = (self.player.x, self.player.y)
+        if position in (self.game_map.stairs_down, self.game_map.stairs_up, self.game_map.special_portal):
+            return True
+        return any((item.x, item.y) == position for item in self.game_map.items)
+    
     def move_player(self, dx, dy):
         new_x, new_y = self.player.x + dx, self.player.y + dy
         
@@ -162,10 +348,21 @@ class GameEngine:
         self.player_turn()
     
     def player_turn(self):
+        self.turns += 1
+        self.autosave.note_turn()
+        
         # Update field of view
         calculate_fov(self.game_map, self.player.x, self.player.y)
         
-        # Enemy turns
+        # Enemy turns - in batch when NumPy is available and the level is crowded
+        if not batch_enemy_turns(self):
+            self.enemy_turns()
+        
+        if self.spectator is not None:
+            self.spectator.publish(self)
+    
+    def enemy_turns(self):
+        """One enemy at a time; batch_enemy_turns computes the same results"""
         for enemy in self.game_map.enemies[:]:  # Copy list to avoid modification during iteration
             if enemy.hp <= 0:
                 continue
@@ -201,9 +398,11 @@ class GameEngine:
             self.player.x == self.game_map.stairs_down[0] and 
             self.player.y == self.game_map.stairs_down[1]):
             
+            self.leave_level()
             self.dungeon_level += 1
             self.add_message(f"You descend to level {self.dungeon_level}!")
             self.initialize_game()
+            self.autosave.request("level")
         else:
             self.add_message("There are no stairs here.")
     
@@ -213,9 +412,11 @@ class GameEngine:
             self.player.y == self.game_map.stairs_up[1]):
             
             if self.dungeon_level > 1:
+                self.leave_level()
                 self.dungeon_level -= 1
                 self.add_message(f"You ascend to level {self.dungeon_level}!")
-                self.initialize_game()
+                self.initialize_game(climbing=True)
+                self.autosave.request("level")
             else:
                 self.add_message("You escape the dungeon! You win!")
                 self.game_state = "won"
@@ -228,37 +429,58 @@ class GameEngine:
             self.player.y == self.game_map.special_portal[1]):
             
             # Special portal jumps 5 levels deeper
+            self.leave_level()
             self.dungeon_level += 5
             self.add_message(f"The portal transports you to level {self.dungeon_level}!")
             self.add_message("You feel the magic energy coursing through you!")
             self.initialize_game()
+            self.autosave.request("level")
         else:
             self.add_message("There is no portal here.")
     
+    @property
+    def save_manager(self):
+        if self._save_manager is None:
+            from save_manager import SaveManager
+            self._save_manager = SaveManager()
+        return self._save_manager
+    
     def quick_save(self):
         """Quick save the current game"""
+        if self.quick_save_slot is None:
+            self.add_message("Quick save is not available here.")
+            return False
         self.update_playtime()
-        success, message = self.save_manager.save_game(self, "Hero", "quicksave")
+        with self.watched('save'):
+            success, message = self.save_manager.save_game(self, "Hero", self.quick_save_slot)
         self.add_message(message)
         return success
     
     def save_game(self, character_name="Hero", slot_name=None):
         """Save the current game state"""
         self.update_playtime()
-        success, message = self.save_manager.save_game(self, character_name, slot_name)
+        with self.watched('save'):
+            success, message = self.save_manager.save_game(self, character_name, slot_name)
         self.add_message(message)
         return success, message
     
     def load_game(self, filepath):
         """Load a saved game state"""
-        success, result = self.save_manager.load_game(filepath)
-        if success:
-            save_data = result
-            self.save_manager.restore_game_state(self, save_data)
-            self.start_time = time.time() - save_data.get('playtime', 0)
-            return True, "Game loaded successfully"
-        else:
-            return False, result
+        with self.watched('load'):
+            success, result = self.save_manager.load_game(filepath)
+            if success:
+                self.restore_save(result)
+                return True, "Game loaded successfully"
+            else:
+                return False, result
+    
+    def restore_save(self, save_data):
+        """Replace the running game with loaded save data"""
+        # The loaded state didn't come from this run's seed, so a replay can't continue past here
+        self.stop_recording()
+        self.save_manager.restore_game_state(self, save_data)
+        self.start_time = time.time() - save_data.get('playtime', 0)
+        self.publish_state()
     
     def update_playtime(self):
         """Update the total playtime"""
@@ -276,33 +498,72 @@ class GameEngine:
         else:
             return f"{minutes:02d}:{seconds:02d}"
     
+    def resize_viewport(self, width, height):
+        """Resize the back buffer to the widget size (in pixels)"""
+        width, height = max(1, width), max(1, height)
+        if (width, height) == (self.screen_width, self.screen_height):
+            return
+        self.screen_width = width
+        self.screen_height = height
+        if not self.headless:
+            self.screen = pygame.Surface((width, height))
+        self.camera.resize(width // self.tile_size, height // self.tile_size)
+    
+    def zoom(self, step):
+        """Move one zoom level in (step > 0) or out (step < 0)"""
+        if self.tile_size in ZOOM_LEVELS:
+            index = ZOOM_LEVELS.index(self.tile_size)
+        else:
+            index = 1
+        index = max(0, min(len(ZOOM_LEVELS) - 1, index + step))
+        self.tile_size = ZOOM_LEVELS[index]
+        self.camera.resize(self.screen_width // self.tile_size, self.screen_height // self.tile_size)
+    
     def draw_char(self, x, y, char, color):
-        pixel_x = x * self.tile_size
-        pixel_y = y * self.tile_size
-        text_surface = self.font.render(char, True, color)
-        self.screen.blit(text_surface, (pixel_x, pixel_y))
+        # x, y are map coordinates; the camera offset turns them into viewport pixels
+        pixel_x = (x - self.camera.x) * self.tile_size
+        pixel_y = (y - self.camera.y) * self.tile_size
+        self.screen.blit(self.glyphs.get(char, color, self.tile_size), (pixel_x, pixel_y))
     
     def render(self):
+        if self.headless:
+            return
+        with self.watched('render'):
+            self.draw_frame()
+    
+    def draw_frame(self):
         self.screen.fill((0, 0, 0))  # Black background
         
-        # Draw map
-        for x in range(self.map_width):
-            for y in range(self.map_height):
-                tile = self.game_map.get_tile(x, y)
-                if tile and tile.explored:
-                    if tile.visible:
-                        color = tile.color
-                    else:
-                        # Darken explored but not visible tiles
-                        color = tuple(c // 3 for c in tile.color)
-                    
-                    self.draw_char(x, y, tile.char, color)
+        # Scroll the viewport to follow the player
+        camera = self.camera
+        camera.set_map_size(self.game_map.width, self.game_map.height)
+        camera.center_on(self.player.x, self.player.y)
+        x0, y0, x1, y1 = camera.visible_bounds()
+        
+        # Draw only the map tiles inside the viewport, batched by tile type:
+        # glyphs are looked up once per type and blitted in a single call
+        game_map = self.game_map
+        size = self.tile_size
+        lit = [self.glyphs.get(t.char, t.color, size) for t in TILE_TYPES]
+        # Darken explored but not visible tiles
+        dim = [self.glyphs.get(t.char, t.dim_color, size) for t in TILE_TYPES]
+        tile_types, explored, visible = game_map.tile_types, game_map.explored, game_map.visible
+        blits = []
+        for x in range(x0, x1):
+            column = x * game_map.height
+            pixel_x = (x - camera.x) * size
+            for y in range(y0, y1):
+                index = column + y
+                if explored[index]:
+                    glyph = lit[tile_types[index]] if visible[index] else dim[tile_types[index]]
+                    blits.append((glyph, (pixel_x, (y - camera.y) * size)))
+        self.screen.blits(blits, doreturn=False)
         
         # Draw stairs
         if self.game_map.stairs_down:
             x, y = self.game_map.stairs_down
             tile = self.game_map.get_tile(x, y)
-            if tile and (tile.visible or tile.explored):
+            if tile and (tile.visible or tile.explored) and camera.in_view(x, y):
                 # Show stairs in bright yellow if visible, dimmed yellow if just explored
                 color = (255, 255, 0) if tile.visible else (128, 128, 0)
                 self.draw_char(x, y, '>', color)
@@ -310,7 +571,7 @@ class GameEngine:
         if self.game_map.stairs_up:
             x, y = self.game_map.stairs_up
             tile = self.game_map.get_tile(x, y)
-            if tile and (tile.visible or tile.explored):
+            if tile and (tile.visible or tile.explored) and camera.in_view(x, y):
                 # Show stairs in bright yellow if visible, dimmed yellow if just explored
                 color = (255, 255, 0) if tile.visible else (128, 128, 0)
                 self.draw_char(x, y, '<', color)
@@ -319,19 +580,23 @@ class GameEngine:
         if self.game_map.special_portal:
             x, y = self.game_map.special_portal
             tile = self.game_map.get_tile(x, y)
-            if tile and (tile.visible or tile.explored):
+            if tile and (tile.visible or tile.explored) and camera.in_view(x, y):
                 # Show portal in bright magenta if visible, dimmed magenta if just explored
                 color = (255, 0, 255) if tile.visible else (128, 0, 128)
                 self.draw_char(x, y, 'P', color)
         
         # Draw items
         for item in self.game_map.items:
+            if not camera.in_view(item.x, item.y):
+                continue
             tile = self.game_map.get_tile(item.x, item.y)
             if tile and tile.visible:
                 self.draw_char(item.x, item.y, item.char, item.color)
         
         # Draw enemies
         for enemy in self.game_map.enemies:
+            if not camera.in_view(enemy.x, enemy.y):
+                continue
             tile = self.game_map.get_tile(enemy.x, enemy.y)
             if tile and tile.visible:
                 self.draw_char(enemy.x, enemy.y, enemy.char, enemy.color)
@@ -352,7 +617,7 @@ class GameEngine:
             'player_gold': self.player.gold,
             'dungeon_level': self.dungeon_level,
             'max_dungeon_level': self.player.max_dungeon_level_reached,
-            'messages': self.game_messages.copy(),
+            'messages': self.message_log.messages(),
             'game_state': self.game_state,
             'has_portal': self.game_map.special_portal is not None,
             'playtime': self.get_playtime_string()
@@ -363,9 +628,30 @@ class GameEngine:
         # This is handled by the PyQt event system
         return True
     
+    def publish_state(self):
+        """Push current values into the observable state; only changed fields notify"""
+        player = self.player
+        state = self.state
+        state.set('hp', (player.hp, player.max_hp))
+        state.set('level', player.level)
+        state.set('exp', (player.exp, player.exp_to_next))
+        state.set('gold', player.gold)
+        state.set('depth', self.dungeon_level)
+        state.set('deepest', player.max_dungeon_level_reached)
+        state.set('portal', self.game_map.special_portal is not None)
+        state.set('game_state', self.game_state)
+        state.set('playtime', self.get_playtime_string())
+        # Catches what happens outside turns, like level changes and loads
+        if self.spectator is not None:
+            self.spectator.publish(self)
+    
     def update(self):
         # Update playtime continuously
         self.update_playtime()
+        self.state.set('playtime', self.get_playtime_string())
+        # Autosaves are taken here, between frames, within their frame-time budget
+        with self.watched('autosave'):
+            self.autosave.poll()
         return True
     
     def get_surface(self):
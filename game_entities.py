@@ -3,6 +3,9 @@ import random
 import math
 
 class Entity:
+    # Slotted entity classes: no per-instance __dict__ (levels hold many of them)
+    __slots__ = ('x', 'y', 'char', 'color', 'hp', 'max_hp')
+    
     def __init__(self, x, y, char, color):
         self.x = x
         self.y = y
@@ -19,6 +22,9 @@ class Entity:
         return False
 
 class Player(Entity):
+    __slots__ = ('level', 'exp', 'exp_to_next', 'attack', 'defense', 'inventory', 'gold',
+                 'current_dungeon_level', 'max_dungeon_level_reached')
+    
     def __init__(self, x, y):
         super().__init__(x, y, '@', (255, 255, 255))
         self.level = 1
@@ -52,6 +58,8 @@ class Player(Entity):
         return damage
 
 class Enemy(Entity):
+    __slots__ = ('name', 'attack', 'defense', 'exp_value', 'ai_state', 'target')
+    
     def __init__(self, x, y, name, char, color, hp, attack, defense, exp_value):
         super().__init__(x, y, char, color)
         self.name = name
@@ -122,6 +130,8 @@ class Enemy(Entity):
         return damage
 
 class Item:
+    __slots__ = ('x', 'y', 'name', 'char', 'color', 'item_type', 'value')
+    
     def __init__(self, x, y, name, char, color, item_type, value=0):
         self.x = x
         self.y = y
@@ -1,45 +1,195 @@
 import random
+from array import array
+from collections import OrderedDict
 from game_entities import create_enemy, create_item
 
-class Tile:
-    def __init__(self, walkable=True, transparent=True, char='.', color=(128, 128, 128)):
+class TileType:
+    """Shared (flyweight) description of one kind of tile"""
+    def __init__(self, name, walkable, transparent, char, color):
+        self.name = name
         self.walkable = walkable
         self.transparent = transparent
         self.char = char
         self.color = color
-        self.explored = False
-        self.visible = False
+        # Color used for explored tiles outside the field of view
+        self.dim_color = tuple(c // 3 for c in color)
+
+# Tile type registry - each map cell stores an index into TILE_TYPES (one byte)
+TILE_TYPES = []
+TILE_TYPE_IDS = {}
+
+def register_tile_type(name, walkable, transparent, char, color):
+    """Add a tile type to the registry and return its id"""
+    if name in TILE_TYPE_IDS:
+        return TILE_TYPE_IDS[name]
+    if len(TILE_TYPES) >= 256:
+        raise ValueError("Too many tile types - ids must fit in one byte")
+    TILE_TYPES.append(TileType(name, walkable, transparent, char, color))
+    TILE_TYPE_IDS[name] = len(TILE_TYPES) - 1
+    return TILE_TYPE_IDS[name]
+
+WALL = register_tile_type('wall', False, False, '#', (100, 100, 100))
+FLOOR = register_tile_type('floor', True, True, '.', (64, 64, 64))
+
+# Themed variants: level theme -> (wall type, floor type)
+THEME_TILES = {
+    "Ancient Crypts": (register_tile_type('crypt_wall', False, False, '#', (110, 100, 80)),
+                       register_tile_type('crypt_floor', True, True, '.', (72, 66, 52))),
+    "Molten Depths": (register_tile_type('basalt_wall', False, False, '#', (140, 70, 40)),
+                      register_tile_type('scorched_floor', True, True, '.', (90, 48, 32))),
+    "Crystal Caverns": (register_tile_type('crystal_wall', False, False, '#', (100, 160, 200)),
+                        register_tile_type('crystal_floor', True, True, '.', (56, 84, 110))),
+    "Shadow Realm": (register_tile_type('shadow_wall', False, False, '#', (80, 70, 110)),
+                     register_tile_type('shadow_floor', True, True, '.', (46, 40, 64))),
+}
+
+def apply_tile_theme(game_map, theme):
+    """Swap plain walls and floors for the theme's variants (one bytes.translate call)"""
+    if theme not in THEME_TILES:
+        return
+    wall, floor = THEME_TILES[theme]
+    table = bytearray(range(256))
+    table[WALL] = wall
+    table[FLOOR] = floor
+    game_map.tile_types = game_map.tile_types.translate(table)
+    game_map.terrain_changed()
+
+class Tile:
+    """Lightweight view of a single map cell"""
+    __slots__ = ('game_map', 'index')
+
+    def __init__(self, game_map, index):
+        self.game_map = game_map
+        self.index = index
+
+    @property
+    def tile_type(self):
+        return TILE_TYPES[self.game_map.tile_types[self.index]]
+
+    @property
+    def walkable(self):
+        return self.tile_type.walkable
+
+    @property
+    def transparent(self):
+        return self.tile_type.transparent
+
+    @property
+    def char(self):
+        return self.tile_type.char
+
+    @property
+    def color(self):
+        return self.tile_type.color
+
+    @property
+    def explored(self):
+        return bool(self.game_map.explored[self.index])
+
+    @explored.setter
+    def explored(self, value):
+        self.game_map.explored[self.index] = 1 if value else 0
+
+    @property
+    def visible(self):
+        return bool(self.game_map.visible[self.index])
+
+    @visible.setter
+    def visible(self, value):
+        self.game_map.visible[self.index] = 1 if value else 0
+        self.game_map.visible_cells = None  # no longer matches the last FOV
 
 class GameMap:
     def __init__(self, width, height, dungeon_level=1):
         self.width = width
         self.height = height
         self.dungeon_level = dungeon_level
-        self.tiles = [[Tile(walkable=False, transparent=False, char='#', color=(100, 100, 100)) 
-                      for _ in range(height)] for _ in range(width)]
+        # Array-backed cells, column-major (index = x * height + y) so a
+        # vertical run of cells is one contiguous slice
+        self.tile_types = bytearray([WALL]) * (width * height)
+        self.explored = bytearray(width * height)
+        self.visible = bytearray(width * height)
         self.rooms = []
         self.enemies = []
         self.items = []
         self.stairs_down = None
         self.stairs_up = None
         self.special_portal = None  # For special level transitions
+        self.spawn = None  # Player start position
+        self.distance_from_spawn = None  # distance_field() from spawn, set by level validation
+        self.explored_version = 0  # bumped whenever new cells become explored
+        # Visible cells by viewpoint (see calculate_fov). Anything that edits
+        # tile_types once the level is in play must call terrain_changed().
+        self.fov_cache = FovCache()
+        self.terrain_version = 0
+        self.visible_cells = None  # cells set in visible by the last FOV; None if unknown
         
     def is_walkable(self, x, y):
         if 0 <= x < self.width and 0 <= y < self.height:
-            return self.tiles[x][y].walkable
+            return TILE_TYPES[self.tile_types[x * self.height + y]].walkable
         return False
     
     def is_transparent(self, x, y):
         if 0 <= x < self.width and 0 <= y < self.height:
-            return self.tiles[x][y].transparent
+            return TILE_TYPES[self.tile_types[x * self.height + y]].transparent
         return False
     
     def get_tile(self, x, y):
         if 0 <= x < self.width and 0 <= y < self.height:
-            return self.tiles[x][y]
+            return Tile(self, x * self.height + y)
         return None
+    
+    def terrain_changed(self):
+        """Drop cached FOV results; call after changing tile_types directly"""
+        self.terrain_version += 1
+    
+    def set_tile_type(self, x, y, tile_type):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            self.tile_types[x * self.height + y] = tile_type
+            self.terrain_version += 1
+    
+    def carve_rect(self, x, y, width, height, tile_type=FLOOR):
+        """Fill a rectangle (clipped to the map) with one tile type, a column slice at a time"""
+        x0, x1 = max(0, x), min(self.width, x + width)
+        y0, y1 = max(0, y), min(self.height, y + height)
+        if x0 >= x1 or y0 >= y1:
+            return
+        run = bytes([tile_type]) * (y1 - y0)
+        for column in range(x0, x1):
+            start = column * self.height + y0
+            self.tile_types[start:start + len(run)] = run
+        self.terrain_version += 1
+    
+    def carve_row(self, x1, x2, y, tile_type=FLOOR):
+        """Fill cells x1..x2 (inclusive, any order) of row y with a strided slice"""
+        if not 0 <= y < self.height:
+            return
+        x0, x1 = max(0, min(x1, x2)), min(self.width - 1, max(x1, x2))
+        if x0 > x1:
+            return
+        count = x1 - x0 + 1
+        start = x0 * self.height + y
+        self.tile_types[start:start + (count - 1) * self.height + 1:self.height] = bytes([tile_type]) * count
+        self.terrain_version += 1
+    
+    def clear_visible(self):
+        self.visible[:] = bytes(len(self.visible))
+        self.visible_cells = None
+    
+    def walkable_mask(self):
+        """Per-cell 1/0 walkability, computed with one bytes.translate call"""
+        table = bytes(1 if t.walkable else 0 for t in TILE_TYPES).ljust(256, b'\0')
+        return self.tile_types.translate(table)
+    
+    def distance_at(self, x, y):
+        """Steps from the spawn point to (x, y), or -1 if unreachable/unknown"""
+        if self.distance_from_spawn is None or not (0 <= x < self.width and 0 <= y < self.height):
+            return -1
+        return self.distance_from_spawn[x * self.height + y]
 
 class Room:
+    __slots__ = ('x', 'y', 'width', 'height', 'center_x', 'center_y')
+    
     def __init__(self, x, y, width, height):
         self.x = x
         self.y = y
@@ -54,11 +204,37 @@ class Room:
                 self.y <= other.y + other.height and
                 self.y + self.height >= other.y)
 
+class RoomIndex:
+    """Grid-bucket spatial index so overlap checks only look at nearby rooms"""
+    def __init__(self, bucket_size=16):
+        self.bucket_size = bucket_size
+        self.buckets = {}
+    
+    def _bucket_keys(self, room):
+        # Rooms that merely touch count as intersecting, so cover one extra cell
+        size = self.bucket_size
+        for bx in range(room.x // size, (room.x + room.width) // size + 1):
+            for by in range(room.y // size, (room.y + room.height) // size + 1):
+                yield bx, by
+    
+    def add(self, room):
+        for key in self._bucket_keys(room):
+            self.buckets.setdefault(key, []).append(room)
+    
+    def intersects_any(self, room):
+        buckets = self.buckets
+        for key in self._bucket_keys(room):
+            for other in buckets.get(key, ()):
+                if room.intersects(other):
+                    return True
+        return False
+
 def generate_dungeon(width, height, dungeon_level=1):
     game_map = GameMap(width, height, dungeon_level)
     
     # Generate rooms
     rooms = []
+    room_index = RoomIndex()
     max_rooms = 15 + dungeon_level * 2
     min_room_size = 4
     max_room_size = 8 + min(dungeon_level // 2, 4)  # Cap room size growth
@@ -72,15 +248,30 @@ def generate_dungeon(width, height, dungeon_level=1):
         new_room = Room(x, y, room_width, room_height)
         
         # Check if room intersects with existing rooms
-        if not any(new_room.intersects(room) for room in rooms):
+        if not room_index.intersects_any(new_room):
             create_room(game_map, new_room)
             
             if rooms:  # Connect to previous room
                 connect_rooms(game_map, rooms[-1], new_room)
             
             rooms.append(new_room)
+            room_index.add(new_room)
+    
+    finish_level(game_map, rooms, dungeon_level)
+    return game_map
+
+def finish_level(game_map, rooms, dungeon_level):
+    """Place exits and populate a carved map - shared by every level generator"""
+    place_exits(game_map, rooms, dungeon_level)
     
+    # Populate with enemies and items
+    populate_dungeon(game_map, dungeon_level)
+
+def place_exits(game_map, rooms, dungeon_level):
+    """Set the map's rooms, spawn point, stairs and portal"""
     game_map.rooms = rooms
+    if rooms:
+        game_map.spawn = (rooms[0].center_x, rooms[0].center_y)
     
     # Always place stairs - ensure every level has exits
     if rooms:
@@ -105,16 +296,9 @@ def generate_dungeon(width, height, dungeon_level=1):
                 portal_x = random.randint(portal_room.x + 1, portal_room.x + portal_room.width - 2)
                 portal_y = random.randint(portal_room.y + 1, portal_room.y + portal_room.height - 2)
                 game_map.special_portal = (portal_x, portal_y)
-    
-    # Populate with enemies and items
-    populate_dungeon(game_map, dungeon_level)
-    
-    return game_map
 
 def create_room(game_map, room):
-    for x in range(room.x, room.x + room.width):
-        for y in range(room.y, room.y + room.height):
-            game_map.tiles[x][y] = Tile(walkable=True, transparent=True, char='.', color=(64, 64, 64))
+    game_map.carve_rect(room.x, room.y, room.width, room.height, FLOOR)
 
 def connect_rooms(game_map, room1, room2):
     # Create L-shaped corridor between rooms
@@ -130,14 +314,11 @@ def connect_rooms(game_map, room1, room2):
         create_horizontal_tunnel(game_map, x1, x2, y2)
 
 def create_horizontal_tunnel(game_map, x1, x2, y):
-    for x in range(min(x1, x2), max(x1, x2) + 1):
-        if 0 <= x < game_map.width and 0 <= y < game_map.height:
-            game_map.tiles[x][y] = Tile(walkable=True, transparent=True, char='.', color=(64, 64, 64))
+    game_map.carve_row(x1, x2, y, FLOOR)
 
 def create_vertical_tunnel(game_map, y1, y2, x):
-    for y in range(min(y1, y2), max(y1, y2) + 1):
-        if 0 <= x < game_map.width and 0 <= y < game_map.height:
-            game_map.tiles[x][y] = Tile(walkable=True, transparent=True, char='.', color=(64, 64, 64))
+    top = min(y1, y2)
+    game_map.carve_rect(x, top, 1, max(y1, y2) - top + 1, FLOOR)
 
 def populate_dungeon(game_map, dungeon_level):
     # Determine enemy types based on dungeon level with more variety
@@ -212,20 +393,136 @@ def populate_dungeon(game_map, dungeon_level):
                     
                     game_map.items.append(item)
 
-def calculate_fov(game_map, player_x, player_y, radius=8):
-    # Reset visibility
-    for x in range(game_map.width):
-        for y in range(game_map.height):
-            game_map.tiles[x][y].visible = False
+def distance_field(game_map, start_x, start_y):
+    """Breadth-first flood fill over walkable cells (8-way, like player movement).
+    Returns an array('i') indexed like the map cells holding the step distance
+    from the start, or -1 for unreachable cells."""
+    if not game_map.is_walkable(start_x, start_y):
+        return array('i', [-1]) * (game_map.width * game_map.height)
+    return flood_distances(game_map.width, game_map.height, game_map.walkable_mask(),
+                           [start_x * game_map.height + start_y])
+
+def flood_distances(width, height, passable, sources):
+    """Multi-source breadth-first distances over cells whose passable[index] is set.
+    Cells are indexed column-major like GameMap; unreachable cells are -1."""
+    distances = array('i', [-1]) * (width * height)
+    frontier = list(sources)
+    for index in frontier:
+        distances[index] = 0
+    step = 0
+    while frontier:
+        step += 1
+        next_frontier = []
+        for index in frontier:
+            x, y = divmod(index, height)
+            for nx in (x - 1, x, x + 1):
+                if not 0 <= nx < width:
+                    continue
+                for ny in (y - 1, y, y + 1):
+                    if not 0 <= ny < height:
+                        continue
+                    neighbour = nx * height + ny
+                    if passable[neighbour] and distances[neighbour] < 0:
+                        distances[neighbour] = step
+                        next_frontier.append(neighbour)
+        frontier = next_frontier
+    return distances
+
+def level_exits(game_map):
+    """All exit positions present on the map"""
+    return [pos for pos in (game_map.stairs_down, game_map.stairs_up, game_map.special_portal) if pos]
+
+def ensure_exits_reachable(game_map):
+    """Check every exit can be reached from the spawn point, carving a corridor
+    to any that cannot. Stores the final distance field on the map and returns
+    the number of repairs made."""
+    if game_map.spawn is None:
+        return 0
+    spawn_x, spawn_y = game_map.spawn
+    field = distance_field(game_map, spawn_x, spawn_y)
+    repairs = 0
+    for exit_x, exit_y in level_exits(game_map):
+        if field[exit_x * game_map.height + exit_y] < 0:
+            create_horizontal_tunnel(game_map, spawn_x, exit_x, spawn_y)
+            create_vertical_tunnel(game_map, spawn_y, exit_y, exit_x)
+            field = distance_field(game_map, spawn_x, spawn_y)
+            repairs += 1
+    game_map.distance_from_spawn = field
+    return repairs
+
+FOV_CACHE_SIZE = 256  # viewpoints remembered per level
+
+class FovCache:
+    """Bounded LRU of visible-cell sets for one level, keyed by (x, y, radius).
+    Walls don't move once a level is in play, so a viewpoint always sees the
+    same cells; the whole cache is dropped when the terrain version changes."""
+    def __init__(self, size=FOV_CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.terrain_version = None
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key, terrain_version):
+        if terrain_version != self.terrain_version:
+            self.entries.clear()
+            self.terrain_version = terrain_version
+            return None
+        cells = self.entries.get(key)
+        if cells is not None:
+            self.entries.move_to_end(key)
+        return cells
     
-    # Simple circular FOV
+    def put(self, key, cells):
+        self.entries[key] = cells
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+def visible_cell_indices(game_map, player_x, player_y, radius):
+    """Compact array of the cell indices visible from (player_x, player_y)"""
+    cells = array('H' if len(game_map.tile_types) <= 0x10000 else 'I')
     for x in range(max(0, player_x - radius), min(game_map.width, player_x + radius + 1)):
         for y in range(max(0, player_y - radius), min(game_map.height, player_y + radius + 1)):
             distance = ((x - player_x) ** 2 + (y - player_y) ** 2) ** 0.5
             if distance <= radius:
                 if has_line_of_sight(game_map, player_x, player_y, x, y):
-                    game_map.tiles[x][y].visible = True
-                    game_map.tiles[x][y].explored = True
+                    cells.append(x * game_map.height + y)
+    return cells
+
+def calculate_fov(game_map, player_x, player_y, radius=8):
+    # Simple circular FOV, memoized per viewpoint: waiting in place or pacing
+    # between known spots costs a cache lookup instead of the line-of-sight tests
+    cache = game_map.fov_cache
+    key = (player_x, player_y, radius)
+    cells = cache.get(key, game_map.terrain_version)
+    if cells is None:
+        cache.misses += 1
+        cells = visible_cell_indices(game_map, player_x, player_y, radius)
+        cache.put(key, cells)
+    else:
+        cache.hits += 1
+    
+    previous = game_map.visible_cells
+    if cells is previous:
+        return  # same view as last turn; its cells are already visible and explored
+    visible, explored = game_map.visible, game_map.explored
+    # Reset visibility - only the previously visible cells, when they're known
+    if previous is None:
+        game_map.clear_visible()
+    else:
+        for index in previous:
+            visible[index] = 0
+    
+    newly_explored = 0
+    for index in cells:
+        visible[index] = 1
+        if not explored[index]:
+            explored[index] = 1
+            newly_explored += 1
+    game_map.visible_cells = cells
+    
+    if newly_explored:
+        game_map.explored_version += 1
 
 def has_line_of_sight(game_map, x1, y1, x2, y2):
     # Bresenham's line algorithm for line of sight
@@ -0,0 +1,31 @@
+_MISSING = object()
+
+class GameStateModel:
+    """Observable game state values.
+    Observers subscribe per field and are only called when that field's value
+    actually changes, so the UI never has to poll or redraw unchanged widgets."""
+    def __init__(self):
+        self.values = {}
+        self.observers = {}
+
+    def subscribe(self, field, callback):
+        """Call callback(value) on every change of field, starting with the current value"""
+        self.observers.setdefault(field, []).append(callback)
+        if field in self.values:
+            callback(self.values[field])
+
+    def unsubscribe(self, field, callback):
+        if callback in self.observers.get(field, []):
+            self.observers[field].remove(callback)
+
+    def get(self, field, default=None):
+        return self.values.get(field, default)
+
+    def set(self, field, value):
+        """Store a value and notify observers if it differs from the previous one"""
+        if self.values.get(field, _MISSING) == value:
+            return False
+        self.values[field] = value
+        for callback in self.observers.get(field, ()):
+            callback(value)
+        return True
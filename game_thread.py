@@ -0,0 +1,199 @@
+import threading
+from collections import namedtuple
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal, pyqtSlot
+from input_queue import InputQueue
+
+# One rendered viewport. pixels is an immutable RGB bytes object; origin is the
+# map cell drawn at the top-left corner, so clicks can be mapped back to cells.
+Frame = namedtuple('Frame', 'pixels width height tile_size origin')
+
+# How often the game thread updates playtime and takes due autosaves
+TICK_INTERVAL_MS = 50
+
+class FrameBuffer:
+    """Triple buffer handing finished frames from the game thread to the GUI.
+    The game thread always has a free slot to publish into and the GUI always
+    reads the newest complete frame; frames the GUI never got to are dropped."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.slots = [None, None, None]
+        self.back, self.ready, self.front = 0, 1, 2
+        self.fresh = False
+
+    def publish(self, frame):
+        """Game thread: fill the back slot, then swap it with the ready slot"""
+        self.slots[self.back] = frame
+        with self.lock:
+            self.back, self.ready = self.ready, self.back
+            self.fresh = True
+
+    def latest(self):
+        """GUI thread: the newest published frame (None before the first one)"""
+        with self.lock:
+            if self.fresh:
+                self.front, self.ready = self.ready, self.front
+                self.fresh = False
+        return self.slots[self.front]
+
+class GameWorker(QObject):
+    """Owns the GameEngine and runs it on its own QThread.
+    The GUI queues commands with push_command and drives everything else
+    through queued slots; the worker answers with frames in the FrameBuffer,
+    state snapshots and message batches. The GUI never touches the engine, so
+    heavy turns or level generation can't freeze menus or resizing."""
+    frameReady = pyqtSignal()
+    stateChanged = pyqtSignal(dict)  # values of the engine's GameStateModel
+    messagesAdded = pyqtSignal(list, bool)  # new message texts, True when they replace the log
+    saveFinished = pyqtSignal(bool, str)
+    loadFinished = pyqtSignal(bool, str)
+    wake = pyqtSignal()  # internal: commands are waiting
+
+    def __init__(self, view_width, view_height):
+        super().__init__()
+        self.frames = FrameBuffer()
+        self.engine = None
+        self.view_size = (view_width, view_height)
+        self.input_queue = InputQueue()
+        self.queue_lock = threading.Lock()
+        self.wake_pending = False
+        self.timer = None
+        self.sent_state = None
+        self.sent_log = None  # (message log, generation) the last messages came from
+        self.sent_seq = 0
+        self.spectator = None  # SpectatorStream when ROGUELIKE_SPECTATE is set
+        self.watchdog = None  # TurnWatchdog unless ROGUELIKE_SLOW_TURN_MS is 0
+        self.wake.connect(self.process_input)
+
+    # --- called from the GUI thread ---
+
+    def push_command(self, command, repeat=False):
+        """Queue a command for the game thread (thread-safe)"""
+        with self.queue_lock:
+            if not self.input_queue.push(command, repeat) or self.wake_pending:
+                return
+            self.wake_pending = True
+        self.wake.emit()
+
+    def clear_commands(self):
+        with self.queue_lock:
+            self.input_queue.clear()
+
+    # --- slots, run on the game thread ---
+
+    @pyqtSlot(str)
+    def new_game(self, replay_path):
+        from game_engine import GameEngine
+        spectator_error = watchdog_error = None
+        if self.engine is not None:
+            self.engine.stop_recording()
+        else:
+            self.timer = QTimer(self)
+            self.timer.timeout.connect(self.tick)
+            self.timer.start(TICK_INTERVAL_MS)
+            from spectator import stream_from_env
+            try:
+                self.spectator = stream_from_env()
+            except OSError as e:
+                spectator_error = f"Spectator stream unavailable: {e}"
+            from turn_watchdog import watchdog_from_env
+            self.watchdog = watchdog_from_env()
+            if self.watchdog is not None and self.watchdog.setting_error:
+                watchdog_error = f"Slow-turn watchdog: {self.watchdog.setting_error}"
+        self.engine = GameEngine(view_width=self.view_size[0], view_height=self.view_size[1],
+                                 replay_path=replay_path or None)
+        self.engine.spectator = self.spectator
+        self.engine.watchdog = self.watchdog
+        self.engine.publish_state()
+        for error in (spectator_error, watchdog_error):
+            if error:
+                self.engine.add_message(error)
+        self.clear_commands()
+        self.publish()
+
+    @pyqtSlot()
+    def process_input(self):
+        """Run every queued command back to back, then publish one frame"""
+        with self.queue_lock:
+            self.wake_pending = False
+        if self.engine is None:
+            return
+        while True:
+            with self.queue_lock:
+                if not self.input_queue:
+                    break
+                command = self.input_queue.pop()
+            self.engine.execute(command)
+        self.publish()
+
+    @pyqtSlot(int, int)
+    def resize(self, width, height):
+        self.view_size = (width, height)
+        if self.engine is not None:
+            self.engine.resize_viewport(width, height)
+            self.publish()
+
+    @pyqtSlot()
+    def tick(self):
+        # Playtime and autosave only; the map hasn't changed
+        self.engine.update()
+        self.publish(render=False)
+
+    @pyqtSlot(str, str)
+    def save_game(self, character_name, slot_name):
+        success, message = self.engine.save_game(character_name, slot_name)
+        self.saveFinished.emit(success, message)
+        self.publish(render=False)
+
+    @pyqtSlot(str)
+    def load_game(self, filepath):
+        success, message = self.engine.load_game(filepath)
+        self.clear_commands()
+        self.loadFinished.emit(success, message)
+        self.publish()
+
+    @pyqtSlot()
+    def stop(self):
+        if self.timer is not None:
+            # Timers must be stopped and deleted on the thread that owns them
+            self.timer.stop()
+            self.timer.deleteLater()
+            self.timer = None
+        if self.engine is not None:
+            self.engine.stop_recording()
+            self.engine.autosave.wait()
+        if self.spectator is not None:
+            self.spectator.close()
+            self.spectator = None
+        if self.watchdog is not None:
+            self.watchdog.close()
+            self.watchdog = None
+
+    # --- publishing ---
+
+    def publish(self, render=True):
+        engine = self.engine
+        state = dict(engine.state.values)
+        if state != self.sent_state:
+            self.sent_state = state
+            self.stateChanged.emit(state)
+
+        log = engine.message_log
+        if self.sent_log != (log, log.generation):
+            # New engine or reset log - send the recent messages as a replacement
+            self.sent_log = (log, log.generation)
+            self.messagesAdded.emit([text for _, text in log.recent], True)
+        else:
+            entries = log.since(self.sent_seq)
+            if entries:
+                self.messagesAdded.emit([text for _, text in entries], False)
+        self.sent_seq = log.last_seq
+
+        if render:
+            import pygame
+            engine.resize_viewport(*self.view_size)
+            engine.render()
+            surface = engine.get_surface()
+            width, height = surface.get_size()
+            self.frames.publish(Frame(pygame.image.tostring(surface, 'RGB'), width, height,
+                                      engine.tile_size, engine.camera.to_map(0, 0)))
+            self.frameReady.emit()
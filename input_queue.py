@@ -0,0 +1,26 @@
+from collections import deque
+
+class InputQueue:
+    """Commands waiting to be turned into game turns.
+    Key events only enqueue; the GUI drains the queue between events, so a
+    slow turn never blocks input handling. Key-repeat commands are coalesced:
+    a repeat is dropped while another command is still waiting, so holding a
+    key can never build up a backlog of turns to catch up on."""
+    def __init__(self, max_pending=16):
+        self.pending = deque(maxlen=max_pending)
+
+    def push(self, command, repeat=False):
+        """Queue a command tuple such as ('key', key) or ('run', key)"""
+        if repeat and self.pending:
+            return False
+        self.pending.append(command)
+        return True
+
+    def pop(self):
+        return self.pending.popleft() if self.pending else None
+
+    def clear(self):
+        self.pending.clear()
+
+    def __len__(self):
+        return len(self.pending)
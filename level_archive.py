@@ -0,0 +1,223 @@
+"""
+Archive of visited levels, kept in a memory-mapped file.
+
+When the player leaves a level, GameEngine writes it to the archive as one
+binary record and drops the GameMap. Going back loads the record instead of
+generating a new level. Only the current level lives on the Python heap. The
+others sit in the archive file, where the OS page cache decides how much of
+them stays in memory.
+
+A record has a fixed layout (all integers little-endian):
+
+    header      RECORD_HEADER: magic, dungeon level, width, height, entity/room
+                counts, exits and spawn (-1, -1 when absent), string table size
+    tiles       width * height tile type ids (column-major, like GameMap)
+    explored    explored flags as a bitset, ceil(width * height / 8) bytes
+    distances   width * height int32 distances from spawn (absent when the
+                header's HAS_DISTANCES flag is clear)
+    rooms       n_rooms * ROOM_RECORD
+    enemies     n_enemies * ENEMY_RECORD
+    items       n_items * ITEM_RECORD
+    strings     names, chars and item types, NUL-separated UTF-8; entity
+                records refer to them by index
+
+Tile ids are the running process's TILE_TYPES ids. The archive belongs to a
+single game run, lives in an anonymous temporary file and is never reused
+by another process.
+"""
+
+import mmap
+import struct
+import tempfile
+from array import array
+
+RECORD_MAGIC = b'LVL1'
+HAS_DISTANCES = 1
+# magic, dungeon level, width, height, rooms, enemies, items, flags,
+# stairs down, stairs up, portal, spawn (x, y each), string table bytes
+RECORD_HEADER = struct.Struct('<4sIHHHHHH8hI')
+ROOM_RECORD = struct.Struct('<4h')  # x, y, width, height
+# x, y, hp, max_hp, attack, defense, exp value, name, char, r, g, b, chasing, target x, target y
+ENEMY_RECORD = struct.Struct('<hhiiiiiHHBBBBhh')
+# x, y, name, char, r, g, b, item type, value
+ITEM_RECORD = struct.Struct('<hhHHBBBHi')
+
+# explored bytes (0/1) <-> '0'/'1' digits, so the bitset is packed by int()
+BIT_DIGITS = b'0' + b'1' * 255
+DIGIT_BITS = bytes(48) + b'\x00\x01' + bytes(206)
+
+def pack_bits(flags):
+    """0/1 bytes -> bitset (first flag in the top bit of the first byte)"""
+    size = (len(flags) + 7) // 8
+    digits = flags.translate(BIT_DIGITS) + b'0' * (size * 8 - len(flags))
+    return int(digits, 2).to_bytes(size, 'big') if digits else b''
+
+def unpack_bits(bitset, count):
+    digits = bin(int.from_bytes(bitset, 'big'))[2:].zfill(len(bitset) * 8)
+    return bytearray(digits[:count].encode('ascii').translate(DIGIT_BITS))
+
+def _position(position):
+    return position if position else (-1, -1)
+
+def _optional_position(x, y):
+    return (x, y) if x >= 0 else None
+
+def encode_level(game_map):
+    """One archive record (bytes) for a GameMap"""
+    strings = {}
+    def string_id(text):
+        return strings.setdefault(text, len(strings))
+
+    rooms = b''.join(ROOM_RECORD.pack(room.x, room.y, room.width, room.height) for room in game_map.rooms)
+    enemies = b''.join(
+        ENEMY_RECORD.pack(enemy.x, enemy.y, enemy.hp, enemy.max_hp, enemy.attack, enemy.defense,
+                          enemy.exp_value, string_id(enemy.name), string_id(enemy.char), *enemy.color,
+                          enemy.ai_state == "chase", *_position(enemy.target))
+        for enemy in game_map.enemies)
+    items = b''.join(
+        ITEM_RECORD.pack(item.x, item.y, string_id(item.name), string_id(item.char), *item.color,
+                         string_id(item.item_type), item.value)
+        for item in game_map.items)
+    string_table = '\0'.join(strings).encode('utf-8')
+
+    distances = game_map.distance_from_spawn
+    flags = HAS_DISTANCES if distances is not None else 0
+    header = RECORD_HEADER.pack(
+        RECORD_MAGIC, game_map.dungeon_level, game_map.width, game_map.height,
+        len(game_map.rooms), len(game_map.enemies), len(game_map.items), flags,
+        *_position(game_map.stairs_down), *_position(game_map.stairs_up),
+        *_position(game_map.special_portal), *_position(game_map.spawn), len(string_table))
+    parts = [header, game_map.tile_types, pack_bits(game_map.explored)]
+    if distances is not None:
+        parts.append(array('i', distances).tobytes())
+    parts += [rooms, enemies, items, string_table]
+    return b''.join(parts)
+
+def decode_level(buffer):
+    """GameMap from a record; buffer is any bytes-like object (e.g. an mmap slice).
+    The cell arrays are copied out in single slices; entities are rebuilt from
+    their fixed-size records."""
+    from game_entities import Enemy, Item
+    from game_map import GameMap, Room
+
+    view = memoryview(buffer)
+    (magic, dungeon_level, width, height, room_count, enemy_count, item_count, flags,
+     down_x, down_y, up_x, up_y, portal_x, portal_y, spawn_x, spawn_y,
+     strings_size) = RECORD_HEADER.unpack_from(view)
+    if magic != RECORD_MAGIC:
+        raise ValueError("Not a level archive record")
+    cells = width * height
+    offset = RECORD_HEADER.size
+
+    game_map = GameMap(width, height, dungeon_level)
+    game_map.tile_types = bytearray(view[offset:offset + cells])
+    offset += cells
+    bitset_size = (cells + 7) // 8
+    game_map.explored = unpack_bits(view[offset:offset + bitset_size], cells)
+    offset += bitset_size
+    if flags & HAS_DISTANCES:
+        distances = array('i')
+        distances.frombytes(view[offset:offset + cells * distances.itemsize])
+        game_map.distance_from_spawn = distances
+        offset += cells * distances.itemsize
+
+    rooms_end = offset + room_count * ROOM_RECORD.size
+    enemies_end = rooms_end + enemy_count * ENEMY_RECORD.size
+    items_end = enemies_end + item_count * ITEM_RECORD.size
+    strings = bytes(view[items_end:items_end + strings_size]).decode('utf-8').split('\0')
+
+    game_map.rooms = [Room(*fields) for fields in ROOM_RECORD.iter_unpack(view[offset:rooms_end])]
+    for (x, y, hp, max_hp, attack, defense, exp_value, name, char, red, green, blue,
+         chasing, target_x, target_y) in ENEMY_RECORD.iter_unpack(view[rooms_end:enemies_end]):
+        enemy = Enemy(x, y, strings[name], strings[char], (red, green, blue), hp, attack, defense, exp_value)
+        enemy.hp, enemy.max_hp = hp, max_hp
+        enemy.ai_state = "chase" if chasing else "patrol"
+        enemy.target = _optional_position(target_x, target_y)
+        game_map.enemies.append(enemy)
+    for x, y, name, char, red, green, blue, item_type, value in ITEM_RECORD.iter_unpack(
+            view[enemies_end:items_end]):
+        game_map.items.append(Item(x, y, strings[name], strings[char], (red, green, blue),
+                                   strings[item_type], value))
+
+    game_map.stairs_down = _optional_position(down_x, down_y)
+    game_map.stairs_up = _optional_position(up_x, up_y)
+    game_map.special_portal = _optional_position(portal_x, portal_y)
+    game_map.spawn = _optional_position(spawn_x, spawn_y)
+    return game_map
+
+class LevelArchive:
+    """Visited levels by dungeon level, in an anonymous memory-mapped file.
+    A level stored again overwrites its old record when the new one fits,
+    and is appended otherwise."""
+    def __init__(self):
+        self.file = None  # created on the first store
+        self.map = None
+        self.mapped_size = 0
+        self.size = 0
+        self.records = {}  # dungeon level -> (offset, length, capacity)
+
+    def __contains__(self, dungeon_level):
+        return dungeon_level in self.records
+
+    def __len__(self):
+        return len(self.records)
+
+    def store(self, game_map):
+        record = encode_level(game_map)
+        if self.file is None:
+            self.file = tempfile.TemporaryFile(prefix='levels_')
+        old = self.records.get(game_map.dungeon_level)
+        if old is not None and len(record) <= old[2]:
+            offset, capacity = old[0], old[2]
+        else:
+            offset, capacity = self.size, len(record)
+            self.size += len(record)
+        self.file.seek(offset)
+        self.file.write(record)
+        self.file.flush()
+        self.records[game_map.dungeon_level] = (offset, len(record), capacity)
+
+    def load(self, dungeon_level):
+        """The archived GameMap for a level, or None if it was never stored"""
+        entry = self.records.get(dungeon_level)
+        if entry is None:
+            return None
+        offset, length, _ = entry
+        self._map_file()
+        # Release the views before returning so the map can be closed later
+        with memoryview(self.map) as view, view[offset:offset + length] as record:
+            return decode_level(record)
+
+    def record(self, dungeon_level):
+        """The raw record (bytes) of an archived level, or None if it was never
+        stored; decode_level turns it back into a GameMap"""
+        entry = self.records.get(dungeon_level)
+        if entry is None:
+            return None
+        offset, length, _ = entry
+        self._map_file()
+        return self.map[offset:offset + length]
+
+    def _map_file(self):
+        if self.map is None or self.mapped_size < self.size:
+            # The file has grown since it was mapped
+            self._unmap()
+            self.map = mmap.mmap(self.file.fileno(), self.size, access=mmap.ACCESS_READ)
+            self.mapped_size = self.size
+
+    def _unmap(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+    def clear(self):
+        """Forget every level (e.g. when a saved game from another run is loaded)"""
+        self._unmap()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.records = {}
+        self.size = 0
+
+    def close(self):
+        self.clear()
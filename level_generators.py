@@ -0,0 +1,316 @@
+import os
+import random
+from game_map import (GameMap, Room, RoomIndex, WALL, FLOOR, generate_dungeon, finish_level,
+                      place_exits, populate_dungeon, create_room, connect_rooms)
+
+# NumPy is optional - cave generation falls back to pure Python without it.
+# It is imported on first use, keeping it off the game's start-up path.
+np = None
+_numpy_checked = False
+
+def _numpy():
+    global np, _numpy_checked
+    if not _numpy_checked:
+        _numpy_checked = True
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            np = None
+    return np
+
+# Registered level generators: name -> {'generate': func, 'budget_ms': float}
+# budget_ms is the allowed generation time per 10,000 map cells, checked by benchmark.py
+GENERATORS = {}
+
+def register_generator(name, budget_ms):
+    """Decorator adding a generate(width, height, dungeon_level) -> GameMap function to the registry"""
+    def decorator(func):
+        GENERATORS[name] = {'generate': func, 'budget_ms': budget_ms}
+        return func
+    return decorator
+
+def get_generator(name):
+    """Get a generator function by name, falling back to rooms-and-corridors"""
+    entry = GENERATORS.get(name) or GENERATORS['rooms']
+    return entry['generate']
+
+def _clamp_room(room_x, room_y, size, width, height):
+    """Build a size x size Room kept one tile inside the map border"""
+    room_x = max(1, min(room_x, width - size - 1))
+    room_y = max(1, min(room_y, height - size - 1))
+    return Room(room_x, room_y, size, size)
+
+@register_generator('rooms', budget_ms=10)
+def generate_rooms(width, height, dungeon_level=1):
+    """The classic rooms-and-corridors layout"""
+    return generate_dungeon(width, height, dungeon_level)
+
+@register_generator('bsp', budget_ms=10)
+def generate_bsp(width, height, dungeon_level=1, min_leaf_size=10):
+    """Binary space partitioning: split the map into leaves and put one room in each"""
+    game_map = GameMap(width, height, dungeon_level)
+    max_room_size = 8 + min(dungeon_level // 2, 4)
+
+    # Split depth-first so consecutive leaves are spatial neighbours
+    leaves = []
+    stack = [(1, 1, width - 2, height - 2)]
+    while stack:
+        x, y, w, h = stack.pop()
+        can_split_x = w >= min_leaf_size * 2
+        can_split_y = h >= min_leaf_size * 2
+        if not (can_split_x or can_split_y):
+            leaves.append((x, y, w, h))
+            continue
+        if can_split_x and can_split_y:
+            # Cut across the long side, or pick at random when roughly square
+            split_x = w > h if abs(w - h) > 4 else random.random() < 0.5
+        else:
+            split_x = can_split_x
+        if split_x:
+            cut = random.randint(min_leaf_size, w - min_leaf_size)
+            stack.append((x + cut, y, w - cut, h))
+            stack.append((x, y, cut, h))
+        else:
+            cut = random.randint(min_leaf_size, h - min_leaf_size)
+            stack.append((x, y + cut, w, h - cut))
+            stack.append((x, y, w, cut))
+
+    rooms = []
+    for x, y, w, h in leaves:
+        room_width = random.randint(4, min(max_room_size, w - 2))
+        room_height = random.randint(4, min(max_room_size, h - 2))
+        room_x = x + random.randint(0, w - room_width - 1)
+        room_y = y + random.randint(0, h - room_height - 1)
+        room = Room(room_x, room_y, room_width, room_height)
+        create_room(game_map, room)
+        if rooms:
+            connect_rooms(game_map, rooms[-1], room)
+        rooms.append(room)
+
+    finish_level(game_map, rooms, dungeon_level)
+    return game_map
+
+def _cave_step_numpy(walls):
+    """One cellular automata step over a (width, height) uint8 wall grid"""
+    padded = np.pad(walls, 1, constant_values=1)  # outside the map counts as wall
+    w, h = walls.shape
+    neighbours = np.zeros(walls.shape, dtype=np.uint8)
+    for dx in (0, 1, 2):
+        for dy in (0, 1, 2):
+            if dx != 1 or dy != 1:
+                neighbours += padded[dx:dx + w, dy:dy + h]
+    return ((neighbours >= 5) | ((walls == 1) & (neighbours >= 4))).astype(np.uint8)
+
+def _cave_step_python(walls, width, height):
+    """Pure-Python fallback for _cave_step_numpy over a column-major bytearray"""
+    result = bytearray(width * height)
+    for x in range(width):
+        for y in range(height):
+            neighbours = 0
+            for nx in (x - 1, x, x + 1):
+                for ny in (y - 1, y, y + 1):
+                    if nx == x and ny == y:
+                        continue
+                    if not (0 <= nx < width and 0 <= ny < height) or walls[nx * height + ny]:
+                        neighbours += 1
+            wall = walls[x * height + y]
+            result[x * height + y] = 1 if neighbours >= 5 or (wall and neighbours >= 4) else 0
+    return result
+
+@register_generator('caves', budget_ms=15)
+def generate_caves(width, height, dungeon_level=1, fill=0.45, steps=4):
+    """Cellular automata caves with chambers linked by tunnels"""
+    game_map = GameMap(width, height, dungeon_level)
+
+    # Initial noise comes from the random module so seeded runs stay reproducible
+    walls = bytearray(random.random() < fill for _ in range(width * height))
+    if _numpy() is not None:
+        grid = np.frombuffer(bytes(walls), dtype=np.uint8).reshape(width, height)
+        for _ in range(steps):
+            grid = _cave_step_numpy(grid)
+        walls = grid.tobytes()
+    else:
+        for _ in range(steps):
+            walls = _cave_step_python(walls, width, height)
+
+    # wall flag -> tile type id
+    game_map.tile_types = bytearray(walls.translate(bytes([FLOOR, WALL]) + bytes(254)))
+    # Solid border
+    game_map.carve_rect(0, 0, width, 1, WALL)
+    game_map.carve_rect(0, height - 1, width, 1, WALL)
+    game_map.carve_rect(0, 0, 1, height, WALL)
+    game_map.carve_rect(width - 1, 0, 1, height, WALL)
+
+    # Open chambers and tie them together so every exit is reachable
+    rooms = []
+    for _ in range(6 + min(dungeon_level // 3, 10)):
+        room = _clamp_room(random.randint(1, width - 6), random.randint(1, height - 6), 5, width, height)
+        create_room(game_map, room)
+        if rooms:
+            connect_rooms(game_map, rooms[-1], room)
+        rooms.append(room)
+
+    finish_level(game_map, rooms, dungeon_level)
+    return game_map
+
+@register_generator('drunkard', budget_ms=20)
+def generate_drunkard(width, height, dungeon_level=1, floor_fraction=0.35, walk_length=200):
+    """Drunkard's walk tunnels - one connected region by construction"""
+    game_map = GameMap(width, height, dungeon_level)
+    tile_types = game_map.tile_types
+
+    x, y = width // 2, height // 2
+    target = int((width - 2) * (height - 2) * floor_fraction)
+    carved = []
+    directions = ((0, 1), (0, -1), (1, 0), (-1, 0))
+    for _ in range(target // walk_length * 20 + 20):
+        # Each walker stumbles for walk_length steps, then a new one starts from
+        # a random carved cell - spreads tunnels out with far fewer revisits
+        for dx, dy in random.choices(directions, k=walk_length):
+            index = x * height + y
+            if tile_types[index] != FLOOR:
+                tile_types[index] = FLOOR
+                carved.append((x, y))
+            # Stay off the border
+            if 0 < x + dx < width - 1 and 0 < y + dy < height - 1:
+                x += dx
+                y += dy
+        if len(carved) >= target:
+            break
+        x, y = random.choice(carved)
+
+    # Chambers are opened around carved cells, so they stay connected to the walk
+    rooms = [_clamp_room(width // 2 - 2, height // 2 - 2, 5, width, height)]
+    create_room(game_map, rooms[0])
+    for _ in range(5 + min(dungeon_level // 3, 10)):
+        cx, cy = random.choice(carved)
+        room = _clamp_room(cx - 2, cy - 2, 5, width, height)
+        create_room(game_map, room)
+        rooms.append(room)
+
+    finish_level(game_map, rooms, dungeon_level)
+    return game_map
+
+# Region generation: huge maps are cut into regions of about REGION_SIZE x
+# REGION_SIZE cells, generated in worker processes from per-region seeds
+REGION_SIZE = 64
+REGION_ROOM_AREA = 200  # one room attempt per this many region cells
+PARALLEL_MIN_CELLS = 1_000_000  # smaller maps are generated in-process (faster than starting workers)
+REGION_WORKERS = None  # worker processes; None for one per CPU
+
+def _region_bounds(size):
+    """Cut 0..size into roughly REGION_SIZE-long spans"""
+    count = max(1, size // REGION_SIZE)
+    return [(size * i // count, size * (i + 1) // count) for i in range(count)]
+
+def _generate_region(job):
+    """Carve and populate one region from its own seed (runs in a worker
+    process, or in-process for smaller maps). Returns (x, y, width, height,
+    tile bytes, rooms, enemies, items) with everything in map coordinates."""
+    region_x, region_y, width, height, dungeon_level, seed = job
+    state = random.getstate()
+    random.seed(seed)
+    try:
+        region = GameMap(width, height, dungeon_level)
+        rooms = []
+        room_index = RoomIndex()
+        max_room_size = 8 + min(dungeon_level // 2, 4)
+        for _ in range(max(1, width * height // REGION_ROOM_AREA)):
+            # Rooms keep a wall between them and the region's edge
+            room_width = random.randint(4, min(max_room_size, width - 2))
+            room_height = random.randint(4, min(max_room_size, height - 2))
+            room = Room(random.randint(1, width - room_width - 1), random.randint(1, height - room_height - 1),
+                        room_width, room_height)
+            if not room_index.intersects_any(room):
+                create_room(region, room)
+                if rooms:
+                    connect_rooms(region, rooms[-1], room)
+                rooms.append(room)
+                room_index.add(room)
+        region.rooms = rooms
+        populate_dungeon(region, dungeon_level)
+    finally:
+        random.setstate(state)
+
+    rooms = [Room(room.x + region_x, room.y + region_y, room.width, room.height) for room in rooms]
+    for entity in region.enemies + region.items:
+        entity.x += region_x
+        entity.y += region_y
+    return (region_x, region_y, width, height, bytes(region.tile_types), rooms,
+            region.enemies, region.items)
+
+def _nearest_rooms(rooms_a, rooms_b):
+    """The closest pair of rooms between two groups (by center distance)"""
+    return min(((a, b) for a in rooms_a for b in rooms_b),
+               key=lambda pair: (abs(pair[0].center_x - pair[1].center_x) +
+                                 abs(pair[0].center_y - pair[1].center_y)))
+
+@register_generator('regions', budget_ms=10)
+def generate_regions(width, height, dungeon_level=1, workers=None):
+    """Region-partitioned layout for very large maps.
+    Each region is an independent rooms-and-corridors dungeon with its own
+    seed, drawn up front so the level doesn't depend on how many workers ran.
+    Big maps generate their regions on a process pool. Neighbouring regions
+    are then stitched together by corridors, and a check over the resulting
+    region graph links any part left over (e.g. behind a region with no rooms)."""
+    game_map = GameMap(width, height, dungeon_level)
+    columns, rows = _region_bounds(width), _region_bounds(height)
+    jobs = [(x0, y0, x1 - x0, y1 - y0, dungeon_level, random.randrange(2 ** 32))
+            for y0, y1 in rows for x0, x1 in columns]
+
+    workers = workers or REGION_WORKERS or os.cpu_count() or 1
+    if workers > 1 and len(jobs) > 1 and width * height >= PARALLEL_MIN_CELLS:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            regions = list(executor.map(_generate_region, jobs,
+                                        chunksize=max(1, len(jobs) // (workers * 4))))
+    else:
+        regions = [_generate_region(job) for job in jobs]
+
+    # Copy each region's columns into the map
+    tile_types = game_map.tile_types
+    for region_x, region_y, region_width, region_height, tiles, _, enemies, items in regions:
+        for column in range(region_width):
+            start = (region_x + column) * height + region_y
+            tile_types[start:start + region_height] = tiles[column * region_height:(column + 1) * region_height]
+        game_map.enemies += enemies
+        game_map.items += items
+
+    # Stitch each region to its right and lower neighbours. Regions are
+    # connected inside, so regions are the nodes of the connectivity check.
+    region_rooms = [region[5] for region in regions]
+    parent = list(range(len(regions)))
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+    def link(a, b):
+        connect_rooms(game_map, *_nearest_rooms(region_rooms[a], region_rooms[b]))
+        parent[find(a)] = find(b)
+
+    for index in range(len(regions)):
+        if not region_rooms[index]:
+            continue
+        row, column = divmod(index, len(columns))
+        for neighbour in ([index + 1] if column + 1 < len(columns) else []) + \
+                         ([index + len(columns)] if row + 1 < len(rows) else []):
+            if region_rooms[neighbour]:
+                link(index, neighbour)
+
+    # Connectivity check: join every leftover group to the nearest region of
+    # the first region's group
+    occupied = [index for index in range(len(regions)) if region_rooms[index]]
+    for index in occupied[1:]:
+        if find(index) != find(occupied[0]):
+            row, column = divmod(index, len(columns))
+            nearest = min((other for other in occupied if find(other) == find(occupied[0])),
+                          key=lambda other: abs(other // len(columns) - row) + abs(other % len(columns) - column))
+            link(index, nearest)
+
+    rooms = [room for group in region_rooms for room in group]
+    place_exits(game_map, rooms, dungeon_level)
+    exits = {game_map.stairs_down, game_map.stairs_up}
+    game_map.items = [item for item in game_map.items if (item.x, item.y) not in exits]
+    return game_map
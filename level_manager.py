@@ -1,9 +1,26 @@
+import os
 import random
-from game_map import generate_dungeon
+from game_map import apply_tile_theme, ensure_exits_reachable
+from level_generators import get_generator
+from level_pack import open_pack
+
+# Maps with at least this many cells use the region generator whatever the theme
+REGION_MAP_CELLS = 250_000
 
 class LevelManager:
-    def __init__(self):
+    def __init__(self, level_pack=None):
         self.generated_levels = {}  # Cache generated levels
+        # Pre-generated levels (see level_pack.py): a pack path, None for
+        # $ROGUELIKE_LEVEL_PACK, or '' for none
+        self.level_pack_path = None
+        self.pack = None
+        self.pack_error = None
+        try:
+            self.pack = open_pack(level_pack)
+        except (OSError, ValueError) as e:
+            self.pack_error = f"Level pack unavailable: {e}"
+        if self.pack is not None:
+            self.level_pack_path = os.path.abspath(self.pack.path)
         self.level_themes = {
             1: "Surface Caves",
             5: "Underground Tunnels", 
@@ -14,12 +31,30 @@ class LevelManager:
             30: "Dragon's Lair",
             50: "Abyss Gates"
         }
+        # Level generator used for each theme (see level_generators.GENERATORS)
+        self.theme_generators = {
+            "Surface Caves": "rooms",
+            "Underground Tunnels": "drunkard",
+            "Ancient Crypts": "bsp",
+            "Molten Depths": "caves",
+            "Crystal Caverns": "caves",
+            "Shadow Realm": "drunkard",
+            "Dragon's Lair": "bsp",
+            "Abyss Gates": "caves"
+        }
         
     def get_level_theme(self, level):
         """Get the theme name for a given level"""
         theme_level = max([l for l in self.level_themes.keys() if l <= level])
         return self.level_themes[theme_level]
     
+    def get_level_generator(self, level, width=0, height=0):
+        """Get the generator function for a level's theme; very large maps
+        are generated in regions instead"""
+        if width * height >= REGION_MAP_CELLS:
+            return get_generator('regions')
+        return get_generator(self.theme_generators.get(self.get_level_theme(level), 'rooms'))
+    
     def get_level_description(self, level):
         """Get a description for the current level"""
         theme = self.get_level_theme(level)
@@ -105,9 +140,18 @@ class LevelManager:
         else:
             return base_multiplier + 15.25 + (level - 50) * 0.5
     
+    def new_level(self, width, height, level):
+        """A level for a depth not visited yet: one of the level pack's variants
+        for that depth when the pack has them at this map size, otherwise
+        generated live"""
+        pack = self.pack
+        if pack is not None and level in pack and (pack.width, pack.height) == (width, height):
+            return pack.load(level, random.randrange(pack.variants(level)))
+        return self.generate_level_with_guaranteed_exits(width, height, level)
+    
     def generate_level_with_guaranteed_exits(self, width, height, level):
         """Generate a level ensuring it always has proper exits"""
-        game_map = generate_dungeon(width, height, level)
+        game_map = self.get_level_generator(level, width, height)(width, height, level)
         
         # Ensure every level has at least one exit
         if not game_map.stairs_down and not game_map.stairs_up and not game_map.special_portal:
@@ -118,6 +162,10 @@ class LevelManager:
                 stairs_y = random.randint(room.y + 1, room.y + room.height - 2)
                 game_map.stairs_down = (stairs_x, stairs_y)
         
+        # Make sure the exits can actually be reached from the spawn point -
+        # repaired with a corridor instead of regenerating the level
+        ensure_exits_reachable(game_map)
+        
         # Add special features based on level
         features = self.should_have_special_features(level)
         
@@ -130,6 +178,9 @@ class LevelManager:
             # Add extra treasure to a random room
             treasure_room = random.choice(game_map.rooms[1:-1])  # Not first or last
             self._populate_treasure_room(game_map, treasure_room, level)
+        
+        # Themed wall/floor variants
+        apply_tile_theme(game_map, self.get_level_theme(level))
             
         return game_map
     
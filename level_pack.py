@@ -0,0 +1,195 @@
+"""
+Level packs: levels generated ahead of time, across all CPU cores.
+
+Generating a level (LevelManager.generate_level_with_guaranteed_exits) is
+slow on big maps, and the player waits for it at every descent. A level pack
+holds finished levels for depths 1..N, a few variants per depth, built
+offline by a process pool. LevelManager takes the level for a new depth from
+the pack when it has one for that depth and map size, and generates it live
+otherwise.
+
+Each level is generated from its own seed, recorded in the pack, so any
+packed level can be regenerated exactly: random.seed(seed), then
+generate_level_with_guaranteed_exits(width, height, depth).
+
+File layout (all integers little-endian):
+
+    header      PACK_HEADER: magic, map width and height, pack seed, number
+                of levels, size of the tile name table
+    tile names  TILE_TYPES names in id order, NUL-separated UTF-8, so packs
+                stay readable if tile ids are ever registered differently
+    index       one INDEX_ENTRY per level: depth, level seed, offset, length
+    records     zlib-compressed level_archive records
+
+Loading a level is an index lookup plus one decompress and decode.
+
+Use a pack for the game with ROGUELIKE_LEVEL_PACK=PATH. From the command line:
+
+    python level_pack.py build PACK [--depths 30] [--variants 3] [--width 200 --height 120] [--jobs N]
+    python level_pack.py info PACK
+"""
+
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+import zlib
+
+from level_archive import decode_level, encode_level
+
+LEVEL_PACK_ENV = 'ROGUELIKE_LEVEL_PACK'
+PACK_MAGIC = b'LPK1'
+# magic, width, height, pack seed, levels, tile name table bytes
+PACK_HEADER = struct.Struct('<4sHHIII')
+# depth, level seed, record offset, record length
+INDEX_ENTRY = struct.Struct('<HIQI')
+
+def _generate(job):
+    """Process pool worker: (depth, seed, compressed record) for one level"""
+    width, height, depth, seed = job
+    import level_generators
+    from level_manager import LevelManager
+    level_generators.REGION_WORKERS = 1  # the pack already keeps every core busy
+    random.seed(seed)
+    game_map = LevelManager(level_pack='').generate_level_with_guaranteed_exits(width, height, depth)
+    return depth, seed, zlib.compress(encode_level(game_map))
+
+def build_pack(path, width, height, depths, variants=1, seed=None, jobs=None, progress=None):
+    """Generate variants levels for each depth in depths with a process pool
+    and write them to a pack at path. progress(done, total) is called as
+    levels finish. Returns the number of levels written."""
+    from concurrent.futures import ProcessPoolExecutor
+    from game_map import TILE_TYPES
+
+    seed = seed if seed is not None else random.randrange(2 ** 32)
+    seeds = random.Random(seed)
+    jobs_list = [(width, height, depth, seeds.randrange(2 ** 32))
+                 for depth in depths for _ in range(variants)]
+    tile_names = '\0'.join(tile.name for tile in TILE_TYPES).encode('utf-8')
+    index_start = PACK_HEADER.size + len(tile_names)
+    records_start = index_start + len(jobs_list) * INDEX_ENTRY.size
+
+    index = []
+    temporary = path + '.tmp'
+    try:
+        with open(temporary, 'wb') as f, ProcessPoolExecutor(max_workers=jobs) as executor:
+            f.write(PACK_HEADER.pack(PACK_MAGIC, width, height, seed, len(jobs_list), len(tile_names)))
+            f.write(tile_names)
+            f.seek(records_start)
+            offset = records_start
+            # Results come back in job order, so the file doesn't depend on scheduling
+            for done, (depth, level_seed, record) in enumerate(executor.map(_generate, jobs_list), 1):
+                f.write(record)
+                index.append(INDEX_ENTRY.pack(depth, level_seed, offset, len(record)))
+                offset += len(record)
+                if progress:
+                    progress(done, len(jobs_list))
+            f.seek(index_start)
+            f.write(b''.join(index))
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return len(index)
+
+class LevelPack:
+    """A level pack opened for reading; the file is memory-mapped, so only
+    the levels actually loaded are read from disk"""
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._read_index()
+        except (struct.error, ValueError, KeyError):
+            self.close()
+            raise ValueError(f"Not a level pack: {path}")
+
+    def _read_index(self):
+        from game_map import TILE_TYPE_IDS
+        magic, self.width, self.height, self.seed, count, names_size = PACK_HEADER.unpack_from(self.map)
+        if magic != PACK_MAGIC:
+            raise ValueError("bad magic")
+        offset = PACK_HEADER.size
+        names = self.map[offset:offset + names_size].decode('utf-8').split('\0')
+        # Pack tile ids -> this process's ids (identity unless the registry differs)
+        ids = [TILE_TYPE_IDS[name] for name in names]
+        self.tile_ids = None if ids == list(range(len(ids))) else bytes(ids + [0] * (256 - len(ids)))
+        offset += names_size
+        self.levels = {}  # depth -> [(level seed, offset, length)], in pack order
+        for depth, seed, record_offset, length in INDEX_ENTRY.iter_unpack(
+                self.map[offset:offset + count * INDEX_ENTRY.size]):
+            self.levels.setdefault(depth, []).append((seed, record_offset, length))
+
+    def __contains__(self, depth):
+        return depth in self.levels
+
+    def __len__(self):
+        return sum(len(variants) for variants in self.levels.values())
+
+    def variants(self, depth):
+        return len(self.levels.get(depth, ()))
+
+    def load(self, depth, variant=0):
+        """The GameMap of one packed level"""
+        _, offset, length = self.levels[depth][variant]
+        game_map = decode_level(zlib.decompress(self.map[offset:offset + length]))
+        if self.tile_ids is not None:
+            game_map.tile_types = game_map.tile_types.translate(self.tile_ids)
+        return game_map
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+def open_pack(path=None):
+    """The pack at path, or at $ROGUELIKE_LEVEL_PACK when path is None.
+    Returns None when no pack is configured; raises OSError/ValueError when
+    the file can't be used."""
+    if path is None:
+        path = os.environ.get(LEVEL_PACK_ENV)
+    return LevelPack(path) if path else None
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Build and inspect level packs")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_parser = commands.add_parser('build', help="generate a pack with a process pool")
+    build_parser.add_argument('pack')
+    build_parser.add_argument('--depths', type=int, default=30, help="pack depths 1..DEPTHS")
+    build_parser.add_argument('--variants', type=int, default=3, help="levels per depth")
+    build_parser.add_argument('--width', type=int, default=80)
+    build_parser.add_argument('--height', type=int, default=50)
+    build_parser.add_argument('--seed', type=int)
+    build_parser.add_argument('--jobs', type=int, help="worker processes (default: one per CPU)")
+    info_parser = commands.add_parser('info', help="describe a pack and time loading from it")
+    info_parser.add_argument('pack')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        def progress(done, total):
+            print(f"\r{done}/{total} levels", end='', flush=True)
+        start = time.perf_counter()
+        count = build_pack(args.pack, args.width, args.height, range(1, args.depths + 1),
+                           args.variants, args.seed, args.jobs, progress)
+        print(f"\nWrote {count} levels to {args.pack} in {time.perf_counter() - start:.1f}s "
+              f"({os.path.getsize(args.pack) / 1024:.0f} KiB)")
+        return 0
+
+    pack = LevelPack(args.pack)
+    print(f"{args.pack}: {len(pack)} levels of {pack.width}x{pack.height}, pack seed {pack.seed}")
+    for depth in sorted(pack.levels):
+        seeds = ', '.join(str(seed) for seed, _, _ in pack.levels[depth])
+        start = time.perf_counter()
+        pack.load(depth)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"  depth {depth:>3}: {pack.variants(depth)} variants, load {elapsed:.1f} ms  (seeds {seeds})")
+    pack.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
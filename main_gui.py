@@ -1,22 +1,38 @@
+import os
 import sys
-import pygame
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QLabel, QTextEdit, QProgressBar, 
                             QPushButton, QFrame, QGridLayout, QScrollArea,
                             QMessageBox, QMenuBar, QAction, QDialog)
-from PyQt5.QtCore import QTimer, Qt, pyqtSignal
+from PyQt5.QtCore import QTimer, QThread, Qt, pyqtSignal
 from PyQt5.QtGui import QFont, QPixmap, QImage, QPalette, QColor, QKeySequence
-from game_engine import GameEngine
-from save_load_dialog import SaveLoadDialog
+from game_state_model import GameStateModel
+from message_log import MessageLog
+
+# pygame, the game thread and the save dialog are imported on first use so the
+# window can be shown before they load (see MainWindow.start_game)
+
+# When set, the game quits right after drawing its first frame (used to time launches)
+EXIT_AFTER_START_ENV = 'ROGUELIKE_EXIT_AFTER_START'
 
 class PygameWidget(QWidget):
+    firstPaint = pyqtSignal()  # emitted once, before the game has started
+    firstFrame = pyqtSignal()  # emitted once, when the first game frame is drawn
+    resized = pyqtSignal(int, int)
     keyPressed = pyqtSignal(int)
+    keyRepeated = pyqtSignal(int)  # held movement key - may be coalesced
+    runPressed = pyqtSignal(int)  # Shift + movement key
+    tileClicked = pyqtSignal(int, int)  # map coordinates
     
-    def __init__(self, game_engine):
+    def __init__(self, frames):
         super().__init__()
-        self.game_engine = game_engine
+        # FrameBuffer the game thread renders into; None until the game starts
+        self.frames = frames
+        self.frame = None  # frame currently on screen
+        self.first_paint_done = False
         self.setFocusPolicy(Qt.StrongFocus)
-        self.setMinimumSize(game_engine.screen_width, game_engine.screen_height)
+        # The camera scrolls over the map, so the widget no longer has to fit all of it
+        self.setMinimumSize(320, 240)
         
         # Key repeat functionality
         self.active_keys = set()  # Track currently pressed keys
@@ -34,24 +50,50 @@ class PygameWidget(QWidget):
         os.environ['QT_LOGGING_RULES'] = "qt.widgets.paintengine=false"
         
     def paintEvent(self, event):
-        if self.game_engine:
-            # Render the pygame surface
-            self.game_engine.render()
-            
-            # Convert pygame surface to QImage and display
-            surface = self.game_engine.get_surface()
-            w, h = surface.get_size()
-            raw = pygame.image.tostring(surface, 'RGB')
-            qimg = QImage(raw, w, h, QImage.Format_RGB888)
-            qpixmap = QPixmap.fromImage(qimg)
-            
-            # Draw on the widget using QPainter instead of paintEngine
-            from PyQt5.QtGui import QPainter
-            painter = QPainter(self)
-            painter.drawPixmap(0, 0, qpixmap)
+        from PyQt5.QtGui import QPainter
+        frame = self.frames.latest() if self.frames else None
+        painter = QPainter(self)
+        if frame is None:
+            # Startup: show the window right away while the level is generated
+            painter.fillRect(self.rect(), Qt.black)
+            painter.setPen(Qt.gray)
+            painter.drawText(self.rect(), Qt.AlignCenter, "Generating level...")
             painter.end()
+            if not self.first_paint_done:
+                self.first_paint_done = True
+                self.firstPaint.emit()
+            return
+        
+        # Blit the newest finished frame; the game thread renders the next one meanwhile
+        if (frame.width, frame.height) != (self.width(), self.height()):
+            painter.fillRect(self.rect(), Qt.black)  # a resize is still being rendered
+        image = QImage(frame.pixels, frame.width, frame.height, frame.width * 3, QImage.Format_RGB888)
+        painter.drawImage(0, 0, image)
+        painter.end()
+        if self.frame is None:
+            self.frame = frame
+            self.firstFrame.emit()
+        self.frame = frame
+    
+    def resizeEvent(self, event):
+        self.resized.emit(self.width(), self.height())
+        super().resizeEvent(event)
+    
+    def mousePressEvent(self, event):
+        # Clicking a tile travels there (mapped through the frame on screen)
+        frame = self.frame
+        if frame and event.button() == Qt.LeftButton:
+            x = frame.origin[0] + event.x() // frame.tile_size
+            y = frame.origin[1] + event.y() // frame.tile_size
+            self.tileClicked.emit(x, y)
+        super().mousePressEvent(event)
     
     def keyPressEvent(self, event):
+        if not self.frames:
+            super().keyPressEvent(event)
+            return
+        import pygame
+        
         # Convert Qt key to pygame key
         qt_to_pygame = {
             Qt.Key_Up: pygame.K_UP,
@@ -72,6 +114,13 @@ class PygameWidget(QWidget):
             Qt.Key_A: pygame.K_a,  # New key for going up stairs
             Qt.Key_P: pygame.K_p,
             Qt.Key_S: pygame.K_s,
+            Qt.Key_X: pygame.K_x,
+            Qt.Key_G: pygame.K_g,
+            Qt.Key_Greater: pygame.K_GREATER,
+            Qt.Key_Less: pygame.K_LESS,
+            Qt.Key_Plus: pygame.K_PLUS,
+            Qt.Key_Equal: pygame.K_EQUALS,
+            Qt.Key_Minus: pygame.K_MINUS,
         }
         
         pygame_key = qt_to_pygame.get(event.key())
@@ -81,6 +130,18 @@ class PygameWidget(QWidget):
                             pygame.K_k, pygame.K_j, pygame.K_h, pygame.K_l,
                             pygame.K_y, pygame.K_u, pygame.K_b, pygame.K_n]
             
+            # Shift + direction runs until something interesting happens
+            if pygame_key in movement_keys and event.modifiers() & Qt.ShiftModifier:
+                self.runPressed.emit(pygame_key)
+                super().keyPressEvent(event)
+                return
+            
+            # OS auto-repeat counts as a held key, not a fresh press
+            if event.isAutoRepeat() and pygame_key in movement_keys:
+                self.keyRepeated.emit(pygame_key)
+                super().keyPressEvent(event)
+                return
+            
             # Send the key press immediately
             self.keyPressed.emit(pygame_key)
             
@@ -97,6 +158,10 @@ class PygameWidget(QWidget):
         super().keyPressEvent(event)
     
     def keyReleaseEvent(self, event):
+        if not self.frames:
+            return
+        import pygame
+        
         # Convert Qt key to pygame key
         qt_to_pygame = {
             Qt.Key_Up: pygame.K_UP,
@@ -136,11 +201,12 @@ class PygameWidget(QWidget):
             if key in self.key_first_press_time:
                 elapsed = current_time - self.key_first_press_time[key]
                 if elapsed >= (self.initial_delay / 1000.0):  # Convert ms to seconds
-                    self.keyPressed.emit(key)
+                    self.keyRepeated.emit(key)
 
 class GameStatsWidget(QWidget):
     def __init__(self):
         super().__init__()
+        self.model = None  # GameStateModel being displayed
         self.init_ui()
     
     def init_ui(self):
@@ -210,11 +276,17 @@ class GameStatsWidget(QWidget):
         controls_text = QLabel("""
 Arrow Keys / hjkl: Move
 yubn: Diagonal movement
+Shift+move: Run
+x: Auto-explore
+> <: Travel to stairs
+g: Travel to portal
+Click: Travel to tile
 .: Wait/Rest
 ,: Pick up item
 d: Go down stairs
 a: Go up stairs
 p: Use portal (if available)
++/-: Zoom in/out
 Ctrl+S: Quick save
         """)
         controls_text.setFont(QFont("Courier", 8))
@@ -266,37 +338,61 @@ P: Magic Portal
         main_layout.addWidget(scroll_area)
         main_layout.setContentsMargins(0, 0, 0, 0)
     
-    def update_stats(self, game_state):
-        # Update HP
-        hp_percent = int((game_state['player_hp'] / game_state['player_max_hp']) * 100)
-        self.hp_bar.setValue(hp_percent)
-        self.hp_label.setText(f"HP: {game_state['player_hp']}/{game_state['player_max_hp']}")
-        
-        # Update level and XP
-        self.level_label.setText(f"Level: {game_state['player_level']}")
-        exp_percent = int((game_state['player_exp'] / game_state['player_exp_to_next']) * 100)
-        self.exp_bar.setValue(exp_percent)
-        self.exp_label.setText(f"EXP: {game_state['player_exp']}/{game_state['player_exp_to_next']}")
-        
-        # Update gold
-        self.gold_label.setText(f"Gold: {game_state['player_gold']}")
-        
-        # Update dungeon level
-        self.dungeon_label.setText(f"Dungeon Level: {game_state['dungeon_level']}")
-        
-        # Update max level reached
-        self.max_level_label.setText(f"Deepest: {game_state['max_dungeon_level']}")
-        
-        # Update playtime
-        self.playtime_label.setText(f"Time: {game_state['playtime']}")
-        
-        # Show portal status
-        if game_state['has_portal']:
-            self.max_level_label.setText(f"Deepest: {game_state['max_dungeon_level']} (Portal!)")
+    def bind(self, model):
+        """Follow a GameStateModel - each label is only touched when its field changes"""
+        handlers = {
+            'hp': self.on_hp_changed,
+            'level': self.on_level_changed,
+            'exp': self.on_exp_changed,
+            'gold': self.on_gold_changed,
+            'depth': self.on_depth_changed,
+            'deepest': self.on_deepest_changed,
+            'portal': self.on_deepest_changed,
+            'playtime': self.on_playtime_changed,
+        }
+        if self.model is not None:
+            for field, handler in handlers.items():
+                self.model.unsubscribe(field, handler)
+        self.model = model
+        for field, handler in handlers.items():
+            model.subscribe(field, handler)
+    
+    def on_hp_changed(self, value):
+        hp, max_hp = value
+        self.hp_bar.setValue(int((hp / max_hp) * 100))
+        self.hp_label.setText(f"HP: {hp}/{max_hp}")
+    
+    def on_level_changed(self, level):
+        self.level_label.setText(f"Level: {level}")
+    
+    def on_exp_changed(self, value):
+        exp, exp_to_next = value
+        self.exp_bar.setValue(int((exp / exp_to_next) * 100))
+        self.exp_label.setText(f"EXP: {exp}/{exp_to_next}")
+    
+    def on_gold_changed(self, gold):
+        self.gold_label.setText(f"Gold: {gold}")
+    
+    def on_depth_changed(self, depth):
+        self.dungeon_label.setText(f"Dungeon Level: {depth}")
+    
+    def on_deepest_changed(self, _value):
+        # Max level reached, with the portal status
+        text = f"Deepest: {self.model.get('deepest', 1)}"
+        if self.model.get('portal'):
+            text += " (Portal!)"
+        self.max_level_label.setText(text)
+    
+    def on_playtime_changed(self, playtime):
+        self.playtime_label.setText(f"Time: {playtime}")
 
 class MessageWidget(QWidget):
     def __init__(self):
         super().__init__()
+        self.message_log = None  # MessageLog currently displayed
+        self.log_generation = 0
+        self.last_seen_seq = 0
+        self.banner = None  # game over / win line already appended
         self.init_ui()
     
     def init_ui(self):
@@ -310,27 +406,96 @@ class MessageWidget(QWidget):
         self.message_area.setReadOnly(True)
         self.message_area.setMaximumHeight(150)
         self.message_area.setFont(QFont("Courier", 9))
+        # Keep the document bounded - old lines drop off the top
+        self.message_area.document().setMaximumBlockCount(200)
         layout.addWidget(self.message_area)
         
         self.setLayout(layout)
     
-    def update_messages(self, messages):
-        self.message_area.clear()
-        for message in messages:
+    def update_messages(self, message_log):
+        """Append only the entries added since the last update"""
+        if message_log is not self.message_log or message_log.generation != self.log_generation:
+            # New game or loaded save - redraw from the log's recent messages
+            self.message_log = message_log
+            self.log_generation = message_log.generation
+            self.message_area.clear()
+            self.banner = None
+            entries = list(message_log.recent)
+        else:
+            entries = message_log.since(self.last_seen_seq)
+        
+        if not entries:
+            return
+        for _, message in entries:
             self.message_area.append(message)
+        self.last_seen_seq = entries[-1][0]
         
         # Scroll to bottom
         scrollbar = self.message_area.verticalScrollBar()
         scrollbar.setValue(scrollbar.maximum())
+    
+    def show_banner(self, text):
+        """Append a game over / win banner once"""
+        if self.banner != text:
+            self.banner = text
+            self.message_area.append(text)
 
 class MainWindow(QMainWindow):
+    # Requests for the game thread (queued across threads)
+    requestNewGame = pyqtSignal(str)  # replay path
+    requestSave = pyqtSignal(str, str)  # character name, save name
+    requestLoad = pyqtSignal(str)  # file path
+    requestResize = pyqtSignal(int, int)
+    requestStop = pyqtSignal()
+    
     def __init__(self):
         super().__init__()
-        # Initialize pygame first
-        pygame.init()
-        self.game_engine = GameEngine()
+        # The game thread is started right after the window's first paint
+        self.worker = None
+        self.game_thread = None
+        # GUI-side copies of the game's state and messages, fed by the game thread
+        self.state = GameStateModel()
+        self.message_log = MessageLog()
         self.init_ui()
-        self.setup_timer()
+        self.stats_widget.bind(self.state)
+        self.pygame_widget.firstPaint.connect(
+            lambda: QTimer.singleShot(0, self.start_game))
+    
+    def start_game(self):
+        """Start the game thread (which builds the engine and first level), then the menus"""
+        import pygame
+        from game_thread import GameWorker
+        from replay import new_replay_path
+        
+        # Only the subsystems the game uses (no audio/joystick start-up cost)
+        pygame.display.init()
+        pygame.font.init()
+        
+        self.worker = GameWorker(self.pygame_widget.width(), self.pygame_widget.height())
+        self.game_thread = QThread(self)
+        self.worker.moveToThread(self.game_thread)
+        self.worker.frameReady.connect(self.pygame_widget.update)
+        self.worker.stateChanged.connect(self.on_state_changed)
+        self.worker.messagesAdded.connect(self.on_messages_added)
+        self.worker.saveFinished.connect(self.on_save_finished)
+        self.worker.loadFinished.connect(self.on_load_finished)
+        self.requestNewGame.connect(self.worker.new_game)
+        self.requestSave.connect(self.worker.save_game)
+        self.requestLoad.connect(self.worker.load_game)
+        self.requestResize.connect(self.worker.resize)
+        self.requestStop.connect(self.worker.stop, Qt.BlockingQueuedConnection)
+        self.pygame_widget.resized.connect(self.requestResize)
+        QApplication.instance().aboutToQuit.connect(self.stop_game_thread)
+        self.game_thread.start()
+        
+        self.pygame_widget.frames = self.worker.frames
+        self.requestNewGame.emit(new_replay_path())
+        self.create_menu_bar()
+        
+        # Launch timing (pyinstaller_build.py --measure): quit once the first game frame is drawn
+        if os.environ.get(EXIT_AFTER_START_ENV):
+            self.pygame_widget.firstFrame.connect(
+                lambda: QTimer.singleShot(0, QApplication.quit))
     
     def init_ui(self):
         # Get screen size information
@@ -351,9 +516,6 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("PyQt5 Roguelike Game")
         self.setGeometry(x_position, y_position, window_width, window_height)
         
-        # Create menu bar
-        self.create_menu_bar()
-        
         # Set dark theme
         self.setStyleSheet("""
             QMainWindow {
@@ -425,8 +587,11 @@ class MainWindow(QMainWindow):
         sidebar_width = int(window_width * 0.3)
         
         # Game area (pygame widget)
-        self.pygame_widget = PygameWidget(self.game_engine)
+        self.pygame_widget = PygameWidget(None)
         self.pygame_widget.keyPressed.connect(self.handle_key_press)
+        self.pygame_widget.keyRepeated.connect(self.handle_key_repeat)
+        self.pygame_widget.runPressed.connect(self.handle_run)
+        self.pygame_widget.tileClicked.connect(self.handle_tile_click)
         self.pygame_widget.setMinimumWidth(game_width)
         main_layout.addWidget(self.pygame_widget, 7)
         
@@ -521,37 +686,51 @@ class MainWindow(QMainWindow):
         about_action.triggered.connect(self.show_about)
         help_menu.addAction(about_action)
     
-    def setup_timer(self):
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_game)
-        self.timer.start(50)  # 20 FPS
+    def queue_command(self, command, repeat=False):
+        # Commands run on the game thread; the frame after them arrives via frameReady
+        if self.worker:
+            self.worker.push_command(command, repeat)
     
     def handle_key_press(self, pygame_key):
-        self.game_engine.handle_input(pygame_key)
-        # Always update UI after any player input
+        self.queue_command(('key', pygame_key))
+    
+    def handle_key_repeat(self, pygame_key):
+        self.queue_command(('key', pygame_key), repeat=True)
+    
+    def handle_run(self, pygame_key):
+        self.queue_command(('run', pygame_key))
+    
+    def handle_tile_click(self, x, y):
+        self.queue_command(('travel', (x, y)))
+    
+    def on_state_changed(self, values):
+        for field, value in values.items():
+            self.state.set(field, value)
         self.update_ui()
     
-    def update_game(self):
-        if self.game_engine.update():
-            self.pygame_widget.update()
-            # Update UI after each game cycle to ensure stats are always current
-            self.update_ui()
+    def on_messages_added(self, texts, replace):
+        if replace:
+            self.message_log.reset(texts)
         else:
-            self.close()
+            for text in texts:
+                self.message_log.add(text)
+        self.update_ui()
     
     def update_ui(self):
-        game_state = self.game_engine.get_game_state()
-        self.stats_widget.update_stats(game_state)
-        self.message_widget.update_messages(game_state['messages'])
+        # Stats update themselves through the state model; messages are incremental
+        self.message_widget.update_messages(self.message_log)
         
         # Handle game over states
-        if game_state['game_state'] == 'dead':
-            self.message_widget.message_area.append("\n=== GAME OVER ===")
-        elif game_state['game_state'] == 'won':
-            self.message_widget.message_area.append("\n=== YOU WIN! ===")
+        game_state = self.state.get('game_state')
+        if game_state == 'dead':
+            self.message_widget.show_banner("\n=== GAME OVER ===")
+        elif game_state == 'won':
+            self.message_widget.show_banner("\n=== YOU WIN! ===")
     
     def new_game(self):
-        if self.game_engine.game_state == "playing":
+        if not self.worker:
+            return
+        if self.state.get('game_state') == "playing":
             reply = QMessageBox.question(
                 self, "New Game",
                 "Start a new game? Current progress will be lost unless saved.",
@@ -561,42 +740,47 @@ class MainWindow(QMainWindow):
             if reply != QMessageBox.Yes:
                 return
         
-        self.game_engine = GameEngine()
-        self.pygame_widget.game_engine = self.game_engine
-        self.update_ui()
+        from replay import new_replay_path
+        self.requestNewGame.emit(new_replay_path())
     
     def save_game(self):
         """Open save game dialog"""
-        if self.game_engine.game_state != "playing":
+        if not self.worker:
+            return
+        if self.state.get('game_state') != "playing":
             QMessageBox.warning(self, "Cannot Save", "Cannot save game when not playing.")
             return
         
+        from save_load_dialog import SaveLoadDialog
         dialog = SaveLoadDialog(self, mode="save")
         if dialog.exec_() == QDialog.Accepted:
             result = dialog.get_result()
             if result:
-                success, message = self.game_engine.save_game(
-                    result['character_name'], 
-                    result['save_name']
-                )
-                if success:
-                    QMessageBox.information(self, "Success", message)
-                else:
-                    QMessageBox.critical(self, "Error", message)
+                # Saved on the game thread; the outcome comes back via on_save_finished
+                self.requestSave.emit(result['character_name'], result['save_name'])
+    
+    def on_save_finished(self, success, message):
+        if success:
+            QMessageBox.information(self, "Success", message)
+        else:
+            QMessageBox.critical(self, "Error", message)
     
     def load_game(self):
         """Open load game dialog"""
+        if not self.worker:
+            return
+        from save_load_dialog import SaveLoadDialog
         dialog = SaveLoadDialog(self, mode="load")
         if dialog.exec_() == QDialog.Accepted:
             result = dialog.get_result()
             if result:
-                success, message = self.game_engine.load_game(result['filepath'])
-                if success:
-                    self.pygame_widget.game_engine = self.game_engine
-                    self.update_ui()
-                    QMessageBox.information(self, "Success", message)
-                else:
-                    QMessageBox.critical(self, "Error", message)
+                self.requestLoad.emit(result['filepath'])
+    
+    def on_load_finished(self, success, message):
+        if success:
+            QMessageBox.information(self, "Success", message)
+        else:
+            QMessageBox.critical(self, "Error", message)
     
     def show_controls_help(self):
         """Show controls help dialog"""
@@ -604,6 +788,11 @@ class MainWindow(QMainWindow):
 MOVEMENT:
 • Arrow Keys or hjkl: Move in cardinal directions
 • yubn: Diagonal movement (roguelike standard)
+• Shift + direction: Run until something interesting happens
+• x: Auto-explore towards unexplored areas
+• > / <: Travel to the stairs down / up
+• g: Travel to the magic portal
+• Click a tile: Travel there
 
 ACTIONS:
 • . (period): Wait/Rest (skip turn)
@@ -611,6 +800,7 @@ ACTIONS:
 • d: Go down stairs
 • a: Go up stairs
 • p: Use magic portal (when available)
+• + / -: Zoom the map view in or out
 
 GAME CONTROLS:
 • Ctrl+S: Quick save
@@ -655,18 +845,26 @@ Enjoy your dungeon crawling adventure!
         """
         QMessageBox.about(self, "About", about_text)
     
+    def stop_game_thread(self):
+        """Let the current turn and any autosave finish, then stop the game thread"""
+        if self.game_thread and self.game_thread.isRunning():
+            self.requestStop.emit()
+            self.game_thread.quit()
+            self.game_thread.wait()
+    
     def closeEvent(self, event):
-        pygame.quit()
+        self.stop_game_thread()
+        if 'pygame' in sys.modules:
+            sys.modules['pygame'].quit()
         event.accept()
 
 def main():
     # Suppress QWidget::paintEngine warnings
-    import os
     os.environ['QT_LOGGING_RULES'] = "qt.widgets.paintengine=false"
     
     app = QApplication(sys.argv)
     
-    # Initialize pygame is now done in MainWindow.__init__
+    # pygame and the first level are initialized in MainWindow.start_game after the first paint
     
     window = MainWindow()
     window.show()
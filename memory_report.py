@@ -0,0 +1,81 @@
+"""
+Memory report for generated levels.
+
+For each dungeon level, tracemalloc measures the peak memory while the level
+is generated, the memory the finished level keeps, and how that splits into
+object categories (map cells, enemies, items, ...). A category's size is what
+tracemalloc sees allocated while copying just that part of the level.
+
+Usage: python memory_report.py [--levels 1,10,30] [--width 80 --height 50] [--seed 1]
+"""
+
+import copy
+import gc
+import random
+import sys
+import tracemalloc
+
+from level_manager import LevelManager
+
+# Category name -> function picking that part out of a GameMap
+CATEGORIES = {
+    'map cells': lambda game_map: (game_map.tile_types, game_map.explored, game_map.visible),
+    'distance field': lambda game_map: game_map.distance_from_spawn,
+    'rooms': lambda game_map: game_map.rooms,
+    'enemies': lambda game_map: game_map.enemies,
+    'items': lambda game_map: game_map.items,
+}
+
+def traced_bytes():
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+def measure_copy(value):
+    """Bytes allocated (and still held) by a deep copy of value"""
+    before = traced_bytes()
+    duplicate = copy.deepcopy(value)
+    size = traced_bytes() - before
+    del duplicate
+    return size
+
+def level_report(level_manager, width, height, dungeon_level):
+    """Get {'peak': bytes, 'retained': bytes, 'categories': {name: bytes}, 'counts': {...}}"""
+    before = traced_bytes()
+    tracemalloc.reset_peak()
+    game_map = level_manager.generate_level_with_guaranteed_exits(width, height, dungeon_level)
+    peak = tracemalloc.get_traced_memory()[1] - before
+    retained = traced_bytes() - before
+    categories = {name: measure_copy(part(game_map)) for name, part in CATEGORIES.items()}
+    counts = {'rooms': len(game_map.rooms), 'enemies': len(game_map.enemies),
+              'items': len(game_map.items)}
+    return {'peak': peak, 'retained': retained, 'categories': categories, 'counts': counts}
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Report memory used per generated level")
+    parser.add_argument('--levels', default='1,5,10,20,30', help="comma-separated dungeon levels")
+    parser.add_argument('--width', type=int, default=80)
+    parser.add_argument('--height', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    level_manager = LevelManager()
+    tracemalloc.start()
+    print(f"Memory per level ({args.width}x{args.height}, KiB):")
+    header = f"  {'level':>5} {'peak':>8} {'kept':>8}" + ''.join(f" {name:>15}" for name in CATEGORIES)
+    print(header)
+    for dungeon_level in (int(level) for level in args.levels.split(',')):
+        random.seed(args.seed * 1000 + dungeon_level)
+        report = level_report(level_manager, args.width, args.height, dungeon_level)
+        row = f"  {dungeon_level:>5} {report['peak'] / 1024:8.1f} {report['retained'] / 1024:8.1f}"
+        for name in CATEGORIES:
+            size = report['categories'][name] / 1024
+            count = report['counts'].get(name)
+            label = f"{size:.1f}" + (f" ({count})" if count is not None else "")
+            row += f" {label:>15}"
+        print(row)
+    tracemalloc.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
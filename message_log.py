@@ -0,0 +1,51 @@
+from collections import deque
+
+class MessageLog:
+    """Sequence-numbered ring buffer of game messages.
+    Readers remember the last sequence number they saw and ask only for newer
+    entries, instead of copying and redrawing the whole log every frame."""
+    def __init__(self, max_recent=10, history_size=500):
+        self.recent = deque(maxlen=max_recent)  # (seq, text) shown in the message panel
+        # Longer scrollback; since() reads only its newest end, so a burst of
+        # messages between two UI updates is never lost
+        self.history = deque(maxlen=history_size) if history_size else None
+        self.last_seq = 0
+        self.generation = 0  # bumped whenever the log is reset
+
+    def add(self, text):
+        self.last_seq += 1
+        entry = (self.last_seq, text)
+        self.recent.append(entry)
+        if self.history is not None:
+            self.history.append(entry)
+        return self.last_seq
+
+    def since(self, seq):
+        """Get (seq, text) entries newer than seq, oldest first"""
+        newer = []
+        # Walk back from the newest entry - only the new entries are touched
+        source = self.history if self.history is not None else self.recent
+        for entry in reversed(source):
+            if entry[0] <= seq:
+                break
+            newer.append(entry)
+        newer.reverse()
+        return newer
+
+    def messages(self):
+        """Get the recent message texts, oldest first"""
+        return [text for _, text in self.recent]
+
+    def last_messages(self, count):
+        """Get up to count of the latest texts from the scrollback history"""
+        source = self.history if self.history is not None else self.recent
+        return [text for _, text in list(source)[-count:]]
+
+    def reset(self, messages=()):
+        """Replace the log contents (e.g. when loading a game); readers redraw fully"""
+        self.recent.clear()
+        if self.history is not None:
+            self.history.clear()
+        self.generation += 1
+        for text in messages:
+            self.add(text)
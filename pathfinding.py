@@ -0,0 +1,81 @@
+from game_map import flood_distances
+
+def _and_masks(a, b):
+    """Cell-wise AND of two 0/1 byte masks (done with one big-integer operation)"""
+    return (int.from_bytes(a, 'big') & int.from_bytes(b, 'big')).to_bytes(len(a), 'big')
+
+def known_walkable_mask(game_map):
+    """Cells the player knows can be walked on - explored and walkable"""
+    return _and_masks(game_map.walkable_mask(), game_map.explored)
+
+def frontier_cells(game_map, known):
+    """Indices of known walkable cells next to an unexplored cell"""
+    count = len(known)
+    ones = int.from_bytes(b'\x01' * count, 'big')
+    unexplored = ones ^ int.from_bytes(game_map.explored, 'big')
+    # Cell i sits at byte i from the left, so shifting by 8 * k bits lines each
+    # cell up with its neighbour k cells away (k = 1: y +/- 1, k = height: x +/- 1).
+    # The x shifts run off the ends of the int; the y shifts would wrap from one
+    # column into the next, so the last row can't see y + 1 nor the first row y - 1.
+    height = game_map.height
+    not_last_row = int.from_bytes((b'\x01' * (height - 1) + b'\x00') * game_map.width, 'big')
+    not_first_row = int.from_bytes((b'\x00' + b'\x01' * (height - 1)) * game_map.width, 'big')
+    near = (((unexplored << 8) & not_last_row) | ((unexplored >> 8) & not_first_row)
+            | (unexplored << (8 * height)) | (unexplored >> (8 * height)))
+    frontier = (int.from_bytes(known, 'big') & near & ones).to_bytes(count, 'big')
+    return [index for index, flag in enumerate(frontier) if flag]
+
+class PathCache:
+    """Distance fields for travel and auto-explore.
+    Fields only cover explored cells, so they stay valid until the map changes
+    or more of it gets explored; until then every step reuses the cached field."""
+    def __init__(self):
+        self.game_map = None
+        self.explored_version = None
+        self.known = None
+        self.fields = {}
+
+    def _refresh(self, game_map):
+        if game_map is not self.game_map or game_map.explored_version != self.explored_version:
+            self.game_map = game_map
+            self.explored_version = game_map.explored_version
+            self.known = known_walkable_mask(game_map)
+            self.fields.clear()
+
+    def field_to(self, game_map, x, y):
+        """Distances to (x, y) over known cells, or None if (x, y) isn't a known walkable cell"""
+        self._refresh(game_map)
+        if not (0 <= x < game_map.width and 0 <= y < game_map.height):
+            return None
+        target = x * game_map.height + y
+        if not self.known[target]:
+            return None
+        if target not in self.fields:
+            self.fields[target] = flood_distances(game_map.width, game_map.height, self.known, [target])
+        return self.fields[target]
+
+    def frontier_field(self, game_map):
+        """Distances to the nearest unexplored edge, or None when everything reachable is explored"""
+        self._refresh(game_map)
+        if 'frontier' not in self.fields:
+            sources = frontier_cells(game_map, self.known)
+            self.fields['frontier'] = (flood_distances(game_map.width, game_map.height, self.known, sources)
+                                       if sources else None)
+        return self.fields['frontier']
+
+    def next_step(self, game_map, field, x, y):
+        """The (dx, dy) step that goes downhill on field from (x, y), or None"""
+        height = game_map.height
+        best = field[x * height + y]
+        if best <= 0:
+            return None
+        step = None
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                nx, ny = x + dx, y + dy
+                if (dx or dy) and 0 <= nx < game_map.width and 0 <= ny < height:
+                    distance = field[nx * height + ny]
+                    if 0 <= distance < best:
+                        best = distance
+                        step = (dx, dy)
+        return step
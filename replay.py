@@ -0,0 +1,147 @@
+"""
+Replay recording and headless playback.
+
+A replay is the run's random seed plus every command the player issued, in
+order. Levels, combat and enemy AI only draw from the seeded random module,
+so playing the commands back into a fresh engine with the same seed repeats
+the run exactly.
+
+File format: one JSON header line ({"version", "seed", "width", "height"},
+plus "level_pack" when the run drew levels from a pack - playback needs the
+same pack), then one line per command - "k <key>" for a key press, "c <key>" for a key
+pressed with Ctrl held, "r <key>" for running
+in a direction and "t <x> <y>" for travelling to a map cell.
+
+Recording stops when a saved game is loaded, because the loaded state didn't
+come from the seed.
+
+Usage: python replay.py RUN.replay [--render 10,250 --render-dir DIR] [--slowest N]
+"""
+
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+REPLAY_VERSION = 1
+REPLAY_DIRECTORY = "replays"
+REPLAY_KEEP = 10  # newest replays kept in REPLAY_DIRECTORY
+
+class ReplayRecorder:
+    """Appends commands to a replay file as they are executed.
+    Every line is flushed, so the replay survives a crash up to the last command."""
+    def __init__(self, filepath, seed, width, height, level_pack=None):
+        self.filepath = filepath
+        self.file = open(filepath, 'w')
+        header = {'version': REPLAY_VERSION, 'seed': seed, 'width': width, 'height': height}
+        if level_pack:
+            header['level_pack'] = level_pack
+        self.file.write(json.dumps(header) + '\n')
+        self.file.flush()
+        self.commands = 0
+
+    def record(self, command):
+        kind, arg = command
+        if kind == 'travel':
+            line = f"t {arg[0]} {arg[1]}"
+        else:
+            line = f"{kind[0]} {arg}"
+        self.file.write(line + '\n')
+        self.file.flush()
+        self.commands += 1
+
+    def close(self):
+        self.file.close()
+
+def parse_command(line):
+    """Convert a replay line back into an input command tuple"""
+    kind, *args = line.split()
+    if kind == 't':
+        return ('travel', (int(args[0]), int(args[1])))
+    if kind == 'r':
+        return ('run', int(args[0]))
+    if kind == 'c':
+        return ('ctrl', int(args[0]))
+    return ('key', int(args[0]))
+
+def read_replay(filepath):
+    """Get (header, commands) from a replay file"""
+    with open(filepath, 'r') as f:
+        header = json.loads(f.readline())
+        if header.get('version') != REPLAY_VERSION:
+            raise ValueError(f"Unsupported replay version: {header.get('version')}")
+        commands = [parse_command(line) for line in f if line.strip()]
+    return header, commands
+
+def new_replay_path(directory=REPLAY_DIRECTORY, keep=REPLAY_KEEP):
+    """Path for a new replay; the oldest replays beyond keep are deleted"""
+    os.makedirs(directory, exist_ok=True)
+    replays = sorted(name for name in os.listdir(directory) if name.endswith('.replay'))
+    for name in replays[:max(0, len(replays) - keep + 1)]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    return os.path.join(directory, f"run_{timestamp}.replay")
+
+def play_replay(filepath, render_steps=(), render_dir=None):
+    """Re-run a replay headlessly as fast as possible.
+    Commands are numbered from 1; the frame after each command in render_steps
+    is rendered (and saved as a PNG in render_dir when given). Returns
+    (engine, timings) where timings[i] is the time in seconds command i + 1 took."""
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import pygame
+    from game_engine import GameEngine
+    pygame.display.init()
+    pygame.font.init()
+
+    header, commands = read_replay(filepath)
+    engine = GameEngine(header['width'], header['height'], seed=header['seed'], autosave_slots=0,
+                        level_pack=header.get('level_pack', ''))
+    render_steps = set(render_steps)
+    if render_dir and render_steps:
+        os.makedirs(render_dir, exist_ok=True)
+
+    timings = []
+    clock = time.perf_counter
+    for step, command in enumerate(commands, 1):
+        start = clock()
+        engine.execute(command)
+        timings.append(clock() - start)
+        if step in render_steps:
+            engine.render()
+            if render_dir:
+                pygame.image.save(engine.screen, os.path.join(render_dir, f"step_{step:06d}.png"))
+    return engine, timings
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Play back a recorded run headlessly")
+    parser.add_argument('replay', help="replay file")
+    parser.add_argument('--render', default='',
+                        help="comma-separated command numbers to render after, e.g. 10,250")
+    parser.add_argument('--render-dir', default='replay_frames', help="where rendered frames go")
+    parser.add_argument('--slowest', type=int, default=5, help="list the N slowest commands")
+    args = parser.parse_args()
+
+    render_steps = [int(step) for step in args.render.split(',') if step.strip()]
+    start = time.perf_counter()
+    engine, timings = play_replay(args.replay, render_steps, args.render_dir)
+    elapsed = time.perf_counter() - start
+
+    print(f"Played {len(timings)} commands in {elapsed:.2f} s "
+          f"(dungeon level {engine.dungeon_level}, HP {engine.player.hp}/{engine.player.max_hp}, "
+          f"state: {engine.game_state})")
+    if timings:
+        print("Slowest commands:")
+        slowest = sorted(range(len(timings)), key=timings.__getitem__, reverse=True)[:args.slowest]
+        for index in slowest:
+            print(f"  #{index + 1:<6} {timings[index] * 1000:8.2f} ms")
+    if render_steps:
+        print(f"Frames written to {args.render_dir}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,116 @@
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QListWidget, 
                             QListWidgetItem, QPushButton, QLabel, QLineEdit,
                             QMessageBox, QInputDialog, QFrame, QTextEdit)
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QFont
-from save_manager import SaveManager
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, QSize, pyqtSignal
+from PyQt5.QtGui import QFont, QIcon, QImage, QPixmap, qRgb
+from save_manager import SaveManager, MINIMAP_UNKNOWN, MINIMAP_WALL, MINIMAP_FLOOR
 import os
 
+# Minimap thumbnails are cached here (inside the save directory), one PNG per save and mtime
+THUMBNAIL_DIRECTORY = '.thumbnails'
+THUMBNAIL_COLORS = {
+    MINIMAP_UNKNOWN: qRgb(30, 30, 30),
+    MINIMAP_WALL: qRgb(100, 100, 100),
+    MINIMAP_FLOOR: qRgb(190, 190, 170),
+}
+PLAYER_COLOR = qRgb(255, 60, 60)
+
+def render_thumbnail(save_manager, save_data):
+    """Minimap QImage of the explored part of the saved level, one pixel per cell"""
+    width, height, cells = save_manager.minimap_cells(save_data)
+    # Cells are column-major; every height-th byte is one row of the image
+    rows = b''.join(bytes(cells[y::height]) for y in range(height))
+    image = QImage(rows, width, height, width, QImage.Format_Indexed8)
+    image.setColorTable([THUMBNAIL_COLORS[value] for value in sorted(THUMBNAIL_COLORS)])
+    image = image.convertToFormat(QImage.Format_RGB32)  # own the pixels; rows is temporary
+    x, y = save_data.get('player_x'), save_data.get('player_y')
+    if x is not None and image.valid(x, y):
+        image.setPixel(x, y, PLAYER_COLOR)
+    return image
+
+class SaveScanSignals(QObject):
+    infoLoaded = pyqtSignal(int, dict)  # scan id, save info
+    thumbnailLoaded = pyqtSignal(int, str, QImage)  # scan id, filename, minimap
+    finished = pyqtSignal(int, list)  # scan id, filenames found
+
+class SaveScanWorker(QRunnable):
+    """Reads save headers and thumbnails on a QThreadPool thread.
+    Saves whose mtime matches the header cache are not parsed at all unless
+    their thumbnail is missing; results stream back through signals."""
+    def __init__(self, save_manager, scan_id):
+        super().__init__()
+        self.save_manager = save_manager
+        self.scan_id = scan_id
+        self.signals = SaveScanSignals()
+        self.cancelled = False
+    
+    def run(self):
+        save_directory = self.save_manager.save_directory
+        thumbnail_directory = os.path.join(save_directory, THUMBNAIL_DIRECTORY)
+        os.makedirs(thumbnail_directory, exist_ok=True)
+        cached = self.save_manager.load_index()
+        index = {}
+        thumbnails = {}  # save filename -> its current thumbnail
+        stamps = self.save_manager.save_stamps()
+        
+        for filename, mtime_ns in stamps.items():
+            if self.cancelled:
+                return
+            filepath = os.path.join(save_directory, filename)
+            thumbnail_name = f"{filename}.{mtime_ns}.png"
+            thumbnail_path = os.path.join(thumbnail_directory, thumbnail_name)
+            
+            save_data = None
+            entry = cached.get(filename)
+            if not entry or entry['mtime_ns'] != mtime_ns:
+                success, save_data = self.save_manager.load_game(filepath)
+                try:
+                    info = self.save_manager.save_info(filename, save_data) if success else None
+                except (AttributeError, KeyError):
+                    info = None
+                if info is None:
+                    continue
+                entry = {'mtime_ns': mtime_ns, 'info': info}
+                self.signals.infoLoaded.emit(self.scan_id, info)
+            index[filename] = entry
+            
+            image = QImage(thumbnail_path)
+            if image.isNull():
+                if save_data is None:
+                    success, save_data = self.save_manager.load_game(filepath)
+                    if not success:
+                        continue
+                try:
+                    image = render_thumbnail(self.save_manager, save_data)
+                except (ValueError, KeyError, TypeError):
+                    continue
+                image.save(thumbnail_path)
+            thumbnails[filename] = thumbnail_name
+            self.signals.thumbnailLoaded.emit(self.scan_id, filename, image)
+        
+        # Drop thumbnails of deleted saves, and the older thumbnails of overwritten
+        # ones. A save that didn't read this time (e.g. one being written) keeps
+        # its thumbnails for the next scan.
+        for name in os.listdir(thumbnail_directory):
+            filename = name.rsplit('.', 2)[0]
+            if filename not in stamps or thumbnails.get(filename, name) != name:
+                try:
+                    os.remove(os.path.join(thumbnail_directory, name))
+                except OSError:
+                    pass
+        if index != cached:
+            self.save_manager.write_index(index)
+        self.signals.finished.emit(self.scan_id, list(index))
+
 class SaveLoadDialog(QDialog):
     def __init__(self, parent=None, mode="save"):
         super().__init__(parent)
         self.mode = mode  # "save" or "load"
         self.save_manager = SaveManager()
         self.selected_save = None
+        self.save_items = {}  # filename -> QListWidgetItem
+        self.scan_id = 0
+        self.scan_worker = None
         self.init_ui()
         self.refresh_save_list()
     
@@ -88,6 +187,7 @@ class SaveLoadDialog(QDialog):
         layout.addWidget(list_label)
         
         self.save_list = QListWidget()
+        self.save_list.setIconSize(QSize(80, 50))
         self.save_list.itemClicked.connect(self.on_save_selected)
         self.save_list.itemDoubleClicked.connect(self.on_double_click)
         layout.addWidget(self.save_list)
@@ -139,25 +239,90 @@ class SaveLoadDialog(QDialog):
         layout.addLayout(button_layout)
     
     def refresh_save_list(self):
-        """Refresh the list of save files"""
+        """Refresh the list of save files.
+        Cached headers are shown straight away; a background scan then adds new
+        or changed saves and their minimap thumbnails as they are read."""
+        self.cancel_scan()
         self.save_list.clear()
-        save_files = self.save_manager.get_save_files()
+        self.save_items = {}
         
-        if not save_files:
-            item = QListWidgetItem("No saved games found")
-            item.setFlags(Qt.NoItemFlags)
-            self.save_list.addItem(item)
-            return
+        for save_info in self.save_manager.cached_save_files():
+            self.show_save_info(save_info)
+        if not self.save_items:
+            self.show_placeholder("Looking for saved games...")
         
-        for save_info in save_files:
-            # Create display text
-            display_text = f"{save_info['character_name']} - Level {save_info['level']}"
-            display_text += f" (Dungeon {save_info['dungeon_level']})"
-            display_text += f" - {save_info['gold']} gold"
-            
-            item = QListWidgetItem(display_text)
-            item.setData(Qt.UserRole, save_info)
-            self.save_list.addItem(item)
+        self.scan_id += 1
+        self.scan_worker = SaveScanWorker(self.save_manager, self.scan_id)
+        self.scan_worker.signals.infoLoaded.connect(self.on_info_loaded)
+        self.scan_worker.signals.thumbnailLoaded.connect(self.on_thumbnail_loaded)
+        self.scan_worker.signals.finished.connect(self.on_scan_finished)
+        QThreadPool.globalInstance().start(self.scan_worker)
+    
+    def cancel_scan(self):
+        """Stop a running scan; anything it still emits is ignored by scan id"""
+        if self.scan_worker:
+            self.scan_worker.cancelled = True
+            self.scan_worker = None
+    
+    def show_placeholder(self, text):
+        item = QListWidgetItem(text)
+        item.setFlags(Qt.NoItemFlags)
+        self.save_list.addItem(item)
+    
+    def show_save_info(self, save_info):
+        """Add or update the list entry for a save, keeping newest first"""
+        # Create display text
+        display_text = f"{save_info['character_name']} - Level {save_info['level']}"
+        display_text += f" (Dungeon {save_info['dungeon_level']})"
+        display_text += f" - {save_info['gold']} gold"
+        
+        item = self.save_items.get(save_info['filename'])
+        if item is not None:
+            self.save_list.takeItem(self.save_list.row(item))
+        else:
+            if not self.save_items:
+                self.save_list.clear()  # drop the placeholder
+            item = QListWidgetItem()
+            self.save_items[save_info['filename']] = item
+        item.setText(display_text)
+        item.setData(Qt.UserRole, save_info)
+        
+        row = 0
+        while (row < self.save_list.count() and
+               self.save_list.item(row).data(Qt.UserRole)['timestamp'] > save_info['timestamp']):
+            row += 1
+        self.save_list.insertItem(row, item)
+    
+    def on_info_loaded(self, scan_id, save_info):
+        if scan_id == self.scan_id:
+            self.show_save_info(save_info)
+    
+    def on_thumbnail_loaded(self, scan_id, filename, image):
+        item = self.save_items.get(filename)
+        if scan_id == self.scan_id and item is not None:
+            item.setIcon(QIcon(QPixmap.fromImage(image)))
+    
+    def on_scan_finished(self, scan_id, filenames):
+        if scan_id != self.scan_id:
+            return
+        self.scan_worker = None
+        # Remove cached entries whose save file is gone
+        for filename in set(self.save_items) - set(filenames):
+            item = self.save_items.pop(filename)
+            self.save_list.takeItem(self.save_list.row(item))
+            if self.selected_save and self.selected_save['filename'] == filename:
+                self.selected_save = None
+                self.details_text.clear()
+                if self.mode == "load":
+                    self.action_btn.setEnabled(False)
+                    self.delete_btn.setEnabled(False)
+        if not self.save_items:
+            self.save_list.clear()
+            self.show_placeholder("No saved games found")
+    
+    def done(self, result):
+        self.cancel_scan()
+        super().done(result)
     
     def on_save_selected(self, item):
         """Handle save file selection"""
@@ -216,7 +381,7 @@ class SaveLoadDialog(QDialog):
         filename = save_name if save_name.endswith('.json') else save_name + '.json'
         filepath = os.path.join(self.save_manager.save_directory, filename)
         
-        if os.path.exists(filepath):
+        if self.save_manager.save_exists(filepath):
             reply = QMessageBox.question(
                 self, "Overwrite Save",
                 f"A save file named '{save_name}' already exists. Overwrite it?",
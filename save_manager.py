@@ -1,13 +1,36 @@
+import base64
 import json
 import os
 import pickle
+import zlib
 from datetime import datetime
 from game_entities import Player, Enemy, Item, ENEMY_TYPES, ITEM_TYPES
+from game_map import TILE_TYPES, TILE_TYPE_IDS, WALL, FLOOR
+
+# Header metadata cache kept in the save directory (see SaveManager.load_index)
+INDEX_FILENAME = '.save_index.json'
+INDEX_VERSION = 1
+
+# Storage backends: loose JSON files, or one SQLite database (see save_store.py)
+SAVE_BACKEND_ENV = 'ROGUELIKE_SAVE_BACKEND'
+SAVE_BACKENDS = ('json', 'sqlite')
+
+# Minimap cell values (see SaveManager.minimap_cells)
+MINIMAP_UNKNOWN = 0
+MINIMAP_WALL = 1
+MINIMAP_FLOOR = 2
 
 class SaveManager:
-    def __init__(self):
-        self.save_directory = "saves"
+    def __init__(self, save_directory="saves", backend=None):
+        self.save_directory = save_directory
         self.ensure_save_directory()
+        backend = backend or os.environ.get(SAVE_BACKEND_ENV) or 'json'
+        if backend not in SAVE_BACKENDS:
+            raise ValueError(f"Unknown save backend: {backend}")
+        self.store = None  # SaveStore with the sqlite backend
+        if backend == 'sqlite':
+            from save_store import SaveStore, DATABASE_FILENAME
+            self.store = SaveStore(os.path.join(save_directory, DATABASE_FILENAME))
     
     def ensure_save_directory(self):
         """Create saves directory if it doesn't exist"""
@@ -16,26 +39,17 @@ class SaveManager:
     
     def get_save_files(self):
         """Get list of available save files"""
+        if self.store is not None:
+            return self.store.query()
         save_files = []
         if os.path.exists(self.save_directory):
             for filename in os.listdir(self.save_directory):
-                if filename.endswith('.json'):
+                # Skip the header cache (INDEX_FILENAME)
+                if filename.endswith('.json') and not filename.startswith('.'):
                     filepath = os.path.join(self.save_directory, filename)
                     try:
                         with open(filepath, 'r') as f:
-                            save_data = json.load(f)
-                            save_info = {
-                                'filename': filename,
-                                'filepath': filepath,
-                                'character_name': save_data.get('character_name', 'Unknown'),
-                                'level': save_data.get('player_level', 1),
-                                'dungeon_level': save_data.get('dungeon_level', 1),
-                                'max_dungeon_level': save_data.get('max_dungeon_level', 1),
-                                'gold': save_data.get('player_gold', 0),
-                                'timestamp': save_data.get('timestamp', 'Unknown'),
-                                'playtime': save_data.get('playtime', 0)
-                            }
-                            save_files.append(save_info)
+                            save_files.append(self.save_info(filename, json.load(f)))
                     except (json.JSONDecodeError, KeyError):
                         continue
         
@@ -43,20 +57,125 @@ class SaveManager:
         save_files.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
         return save_files
     
+    def save_info(self, filename, save_data):
+        """Header metadata shown in the save browser"""
+        return {
+            'filename': filename,
+            'filepath': os.path.join(self.save_directory, filename),
+            'character_name': save_data.get('character_name', 'Unknown'),
+            'level': save_data.get('player_level', 1),
+            'dungeon_level': save_data.get('dungeon_level', 1),
+            'max_dungeon_level': save_data.get('max_dungeon_level', 1),
+            'gold': save_data.get('player_gold', 0),
+            'timestamp': save_data.get('timestamp', 'Unknown'),
+            'playtime': save_data.get('playtime', 0)
+        }
+    
+    def load_index(self):
+        """Cached header metadata: filename -> {'mtime_ns': ..., 'info': {...}}.
+        Entries are only trusted while the save file's mtime matches."""
+        if self.store is not None:
+            # The store's header columns are always current
+            return {info['filename']: {'mtime_ns': info['mtime_ns'], 'info': info}
+                    for info in self.store.query()}
+        try:
+            with open(os.path.join(self.save_directory, INDEX_FILENAME), 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if index.get('version') != INDEX_VERSION:
+            return {}
+        return index.get('saves', {})
+    
+    def write_index(self, entries):
+        """Replace the header cache (written to a temp file first so readers never see half of it)"""
+        if self.store is not None:
+            return
+        filepath = os.path.join(self.save_directory, INDEX_FILENAME)
+        try:
+            with open(filepath + '.tmp', 'w') as f:
+                json.dump({'version': INDEX_VERSION, 'saves': entries}, f)
+            os.replace(filepath + '.tmp', filepath)
+        except OSError:
+            pass  # the cache is only a speed-up
+    
+    def save_stamps(self):
+        """{filename: mtime_ns} of every save; a save's stamp changes whenever it's rewritten"""
+        if self.store is not None:
+            return self.store.stamps()
+        stamps = {}
+        try:
+            filenames = os.listdir(self.save_directory)
+        except OSError:
+            return stamps
+        for filename in filenames:
+            # Skip the header cache (INDEX_FILENAME)
+            if filename.endswith('.json') and not filename.startswith('.'):
+                try:
+                    stamps[filename] = os.stat(os.path.join(self.save_directory, filename)).st_mtime_ns
+                except OSError:
+                    continue
+        return stamps
+    
+    def save_exists(self, filepath):
+        if self.store is not None:
+            return os.path.basename(filepath) in self.store
+        return os.path.exists(filepath)
+    
+    def cached_save_files(self):
+        """Save infos from the header cache, newest first - no save file is opened"""
+        save_files = [entry['info'] for entry in self.load_index().values()]
+        save_files.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
+        return save_files
+    
+    def minimap_cells(self, save_data):
+        """(width, height, cells) for a minimap of the saved level: one byte per cell,
+        column-major like GameMap, with MINIMAP_UNKNOWN / MINIMAP_WALL / MINIMAP_FLOOR
+        for unexplored, explored wall and explored floor cells"""
+        level_data = save_data['current_level']
+        width, height = level_data['width'], level_data['height']
+        if 'tile_types' in level_data:
+            # saved palette id -> minimap value for an explored cell
+            table = bytearray(256)
+            for saved_id, name in enumerate(level_data['tile_palette']):
+                tile_type = TILE_TYPES[TILE_TYPE_IDS.get(name, WALL)]
+                table[saved_id] = MINIMAP_FLOOR if tile_type.walkable else MINIMAP_WALL
+            cells = self._unpack_cells(level_data['tile_types']).translate(table)
+            # Mask out unexplored cells (MINIMAP_UNKNOWN is 0) with one big-integer AND
+            mask = self._unpack_cells(level_data['explored']).translate(bytes([0]) + b'\xff' * 255)
+            cells = bytearray((int.from_bytes(cells, 'big') & int.from_bytes(mask, 'big'))
+                              .to_bytes(len(cells), 'big'))
+        else:
+            cells = bytearray(width * height)
+            for x, column in enumerate(level_data['tiles']):
+                for y, tile_data in enumerate(column):
+                    if tile_data['explored']:
+                        cells[x * height + y] = MINIMAP_FLOOR if tile_data['walkable'] else MINIMAP_WALL
+        return width, height, cells
+    
     def save_game(self, game_engine, character_name="Hero", slot_name=None):
         """Save the current game state"""
+        return self.write_save(self.slot_path(slot_name), self.build_save_data(game_engine, character_name))
+    
+    def slot_path(self, slot_name=None):
+        """Path of the save file for a slot name (timestamped when no name is given)"""
         if slot_name is None:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             slot_name = f"save_{timestamp}.json"
         
         if not slot_name.endswith('.json'):
             slot_name += '.json'
-        
-        save_data = {
-            'version': '1.0',
+        return os.path.join(self.save_directory, slot_name)
+    
+    def build_save_data(self, game_engine, character_name="Hero"):
+        """Snapshot the game into plain data. Must run on the game's thread; the
+        result shares no mutable state with the engine, so write_save can run on any thread."""
+        return {
+            'version': '1.1',
             'timestamp': datetime.now().isoformat(),
             'character_name': character_name,
             'playtime': getattr(game_engine, 'playtime', 0),
+            'turns': getattr(game_engine, 'turns', 0),
             
             # Player data
             'player_x': game_engine.player.x,
@@ -75,18 +194,27 @@ class SaveManager:
             'dungeon_level': game_engine.dungeon_level,
             'max_dungeon_level': game_engine.player.max_dungeon_level_reached,
             'game_state': game_engine.game_state,
-            'game_messages': game_engine.game_messages[-20:],  # Save last 20 messages
+            'game_messages': game_engine.message_log.last_messages(20),  # Save last 20 messages
             
             # Current level data
             'map_width': game_engine.map_width,
             'map_height': game_engine.map_height,
-            'current_level': self._serialize_level(game_engine.game_map)
+            'current_level': self._serialize_level(game_engine.game_map),
+            # Levels left behind, as level_archive records, so going back finds them as they were
+            'visited_levels': self._serialize_visited_levels(game_engine)
         }
-        
-        filepath = os.path.join(self.save_directory, slot_name)
+    
+    def write_save(self, filepath, save_data):
+        """Write save data to disk. The file is written under a temporary name and
+        then renamed, so a crash mid-write never leaves a half-written save."""
+        slot_name = os.path.basename(filepath)
         try:
-            with open(filepath, 'w') as f:
+            if self.store is not None:
+                self.store.put(slot_name, save_data, self.save_info(slot_name, save_data))
+                return True, f"Game saved as {slot_name}"
+            with open(filepath + '.tmp', 'w') as f:
                 json.dump(save_data, f, indent=2)
+            os.replace(filepath + '.tmp', filepath)
             return True, f"Game saved as {slot_name}"
         except Exception as e:
             return False, f"Failed to save game: {str(e)}"
@@ -94,6 +222,8 @@ class SaveManager:
     def load_game(self, filepath):
         """Load a saved game state"""
         try:
+            if self.store is not None:
+                return True, self.store.get(os.path.basename(filepath))
             with open(filepath, 'r') as f:
                 save_data = json.load(f)
             
@@ -104,7 +234,11 @@ class SaveManager:
     def delete_save(self, filepath):
         """Delete a save file"""
         try:
-            os.remove(filepath)
+            if self.store is not None:
+                if not self.store.delete(os.path.basename(filepath)):
+                    raise KeyError(os.path.basename(filepath))
+            else:
+                os.remove(filepath)
             return True, "Save file deleted successfully"
         except Exception as e:
             return False, f"Failed to delete save: {str(e)}"
@@ -163,26 +297,18 @@ class SaveManager:
         enemy.target = enemy_data['target']
         return enemy
     
-    def _serialize_tile(self, tile):
-        """Convert tile to serializable format"""
-        return {
-            'walkable': tile.walkable,
-            'transparent': tile.transparent,
-            'char': tile.char,
-            'color': tile.color,
-            'explored': tile.explored,
-            'visible': tile.visible
-        }
+    def _pack_cells(self, cells):
+        """Compress a per-cell bytearray into a JSON-safe string"""
+        return base64.b64encode(zlib.compress(bytes(cells))).decode('ascii')
     
-    def _deserialize_tile(self, tile_data):
-        """Convert serialized data back to Tile object"""
-        from game_map import Tile
-        tile = Tile(
-            tile_data['walkable'],
-            tile_data['transparent'],
-            tile_data['char'],
-            tile_data['color']
-        )
+    def _unpack_cells(self, text):
+        """Convert a string from _pack_cells back to a bytearray"""
+        return bytearray(zlib.decompress(base64.b64decode(text)))
+    
+    def _deserialize_tile(self, game_map, x, y, tile_data):
+        """Restore per-tile data from version 1.0 saves into a map cell"""
+        game_map.set_tile_type(x, y, FLOOR if tile_data['walkable'] else WALL)
+        tile = game_map.get_tile(x, y)
         tile.explored = tile_data['explored']
         tile.visible = tile_data['visible']
         return tile
@@ -193,25 +319,60 @@ class SaveManager:
             'width': game_map.width,
             'height': game_map.height,
             'dungeon_level': game_map.dungeon_level,
-            'tiles': [[self._serialize_tile(game_map.tiles[x][y]) 
-                      for y in range(game_map.height)] 
-                     for x in range(game_map.width)],
+            # Cells are stored as tile type ids plus the explored flags; visibility
+            # is recomputed on load
+            'tile_palette': [tile_type.name for tile_type in TILE_TYPES],
+            'tile_types': self._pack_cells(game_map.tile_types),
+            'explored': self._pack_cells(game_map.explored),
             'enemies': [self._serialize_enemy(enemy) for enemy in game_map.enemies],
             'items': [self._serialize_item(item) for item in game_map.items],
             'stairs_down': game_map.stairs_down,
             'stairs_up': game_map.stairs_up,
-            'special_portal': game_map.special_portal
+            'special_portal': game_map.special_portal,
+            'spawn': game_map.spawn
         }
     
+    def _serialize_visited_levels(self, game_engine):
+        """Archived levels other than the current one: dungeon level -> packed record"""
+        levels = game_engine.levels
+        return {
+            'tile_palette': [tile_type.name for tile_type in TILE_TYPES],
+            'records': {str(dungeon_level): self._pack_cells(levels.record(dungeon_level))
+                        for dungeon_level in sorted(levels.records)
+                        if dungeon_level != game_engine.dungeon_level}
+        }
+    
+    def _restore_visited_levels(self, game_engine, visited_data):
+        """Refill the engine's level archive from _serialize_visited_levels data"""
+        from level_archive import decode_level
+        game_engine.levels.clear()
+        if not visited_data:
+            return  # Saves from before visited levels were kept
+        table = bytearray(range(256))
+        for saved_id, name in enumerate(visited_data['tile_palette']):
+            table[saved_id] = TILE_TYPE_IDS.get(name, WALL)
+        for record in visited_data['records'].values():
+            game_map = decode_level(self._unpack_cells(record))
+            game_map.tile_types = game_map.tile_types.translate(table)
+            game_engine.levels.store(game_map)
+    
     def _deserialize_level(self, level_data):
         """Convert serialized data back to GameMap object"""
         from game_map import GameMap
         game_map = GameMap(level_data['width'], level_data['height'], level_data['dungeon_level'])
         
         # Restore tiles
-        for x in range(game_map.width):
-            for y in range(game_map.height):
-                game_map.tiles[x][y] = self._deserialize_tile(level_data['tiles'][x][y])
+        if 'tile_types' in level_data:
+            # Map the saved palette onto the current registry ids
+            table = bytearray(range(256))
+            for saved_id, name in enumerate(level_data['tile_palette']):
+                table[saved_id] = TILE_TYPE_IDS.get(name, WALL)
+            game_map.tile_types = self._unpack_cells(level_data['tile_types']).translate(table)
+            game_map.explored = self._unpack_cells(level_data['explored'])
+        else:
+            for x in range(game_map.width):
+                for y in range(game_map.height):
+                    self._deserialize_tile(game_map, x, y, level_data['tiles'][x][y])
         
         # Restore enemies
         game_map.enemies = [self._deserialize_enemy(enemy_data) for enemy_data in level_data['enemies']]
@@ -220,9 +381,11 @@ class SaveManager:
         game_map.items = [self._deserialize_item(item_data) for item_data in level_data['items']]
         
         # Restore special locations
-        game_map.stairs_down = level_data['stairs_down']
-        game_map.stairs_up = level_data['stairs_up']
-        game_map.special_portal = level_data['special_portal']
+        # JSON turns tuples into lists
+        game_map.stairs_down = tuple(level_data['stairs_down']) if level_data['stairs_down'] else None
+        game_map.stairs_up = tuple(level_data['stairs_up']) if level_data['stairs_up'] else None
+        game_map.special_portal = tuple(level_data['special_portal']) if level_data['special_portal'] else None
+        game_map.spawn = tuple(level_data['spawn']) if level_data.get('spawn') else None
         
         return game_map
     
@@ -251,10 +414,14 @@ class SaveManager:
         # Restore game state
         game_engine.dungeon_level = save_data['dungeon_level']
         game_engine.game_state = save_data['game_state']
-        game_engine.game_messages = save_data['game_messages']
+        game_engine.turns = save_data.get('turns', 0)
+        game_engine.message_log.reset(save_data['game_messages'])
         
-        # Restore current level
+        # Restore current level, and the map size new levels are generated at
+        game_engine.map_width = save_data.get('map_width', game_engine.map_width)
+        game_engine.map_height = save_data.get('map_height', game_engine.map_height)
         game_engine.game_map = self._deserialize_level(save_data['current_level'])
+        self._restore_visited_levels(game_engine, save_data.get('visited_levels'))
         
         # Restore field of view
         from game_map import calculate_fov
@@ -0,0 +1,276 @@
+"""
+SQLite save store: an optional backend for SaveManager.
+
+Saves live in one database (saves/saves.db by default) instead of loose JSON
+files. The header fields shown in the save browser are ordinary indexed
+columns, so listing saves or asking for "the deepest runs" or "every save of
+this character" never touches the game data. That is kept as a
+zlib-compressed JSON blob in its own table and read only when a save is loaded.
+
+The database runs in WAL mode, so the save browser can read while autosave
+writes from its background thread. Each thread gets its own connection.
+
+Enable it for the game with ROGUELIKE_SAVE_BACKEND=sqlite. Existing JSON
+saves can be moved in and out with the command line:
+
+    python save_store.py import saves/*.json
+    python save_store.py export DIRECTORY [filename ...]
+    python save_store.py list [--character NAME] [--order depth] [--limit 10]
+    python save_store.py bench [--count 5000]
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+
+DATABASE_FILENAME = 'saves.db'
+SCHEMA_VERSION = 1
+
+# Header columns; the names match SaveManager.save_info
+COLUMNS = ('character_name', 'level', 'dungeon_level', 'max_dungeon_level', 'gold', 'timestamp', 'playtime')
+# --order choices -> column
+ORDERS = {
+    'timestamp': 'timestamp',
+    'depth': 'max_dungeon_level',
+    'gold': 'gold',
+    'level': 'level',
+    'character': 'character_name',
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS saves (
+    id INTEGER PRIMARY KEY,
+    filename TEXT NOT NULL UNIQUE,
+    character_name TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    dungeon_level INTEGER NOT NULL,
+    max_dungeon_level INTEGER NOT NULL,
+    gold INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    playtime REAL NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS saves_character ON saves (character_name);
+CREATE INDEX IF NOT EXISTS saves_depth ON saves (max_dungeon_level);
+CREATE INDEX IF NOT EXISTS saves_gold ON saves (gold);
+CREATE INDEX IF NOT EXISTS saves_timestamp ON saves (timestamp);
+CREATE TABLE IF NOT EXISTS payloads (
+    save_id INTEGER PRIMARY KEY REFERENCES saves (id) ON DELETE CASCADE,
+    data BLOB NOT NULL
+);
+"""
+
+def compress_save(save_data):
+    return zlib.compress(json.dumps(save_data, separators=(',', ':')).encode('utf-8'))
+
+def decompress_save(blob):
+    return json.loads(zlib.decompress(blob))
+
+class SaveStore:
+    """Saves keyed by filename (e.g. 'quicksave.json'), with indexed headers"""
+    def __init__(self, path):
+        self.path = path
+        self.save_directory = os.path.dirname(path) or '.'
+        self.local = threading.local()
+        connection = self.connection()
+        connection.executescript(SCHEMA)
+        connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def connection(self):
+        """This thread's connection (sqlite3 connections can't be shared between threads)"""
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")  # WAL keeps this crash-safe
+            connection.execute("PRAGMA foreign_keys = ON")
+            self.local.connection = connection
+        return connection
+
+    def close(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self.local.connection = None
+
+    def put(self, filename, save_data, info):
+        """Insert or replace a save; info is its SaveManager.save_info"""
+        blob = compress_save(save_data)
+        values = [info[column] for column in COLUMNS]
+        connection = self.connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT id FROM saves WHERE filename = ?", (filename,)).fetchone()
+            if row is None:
+                save_id = connection.execute(
+                    f"INSERT INTO saves (filename, {', '.join(COLUMNS)}, mtime_ns) "
+                    f"VALUES (?, {', '.join('?' * len(COLUMNS))}, ?)",
+                    [filename, *values, time.time_ns()]).lastrowid
+            else:
+                save_id = row[0]
+                connection.execute(
+                    f"UPDATE saves SET {', '.join(f'{column} = ?' for column in COLUMNS)}, mtime_ns = ? "
+                    "WHERE id = ?", [*values, time.time_ns(), save_id])
+            connection.execute("INSERT OR REPLACE INTO payloads (save_id, data) VALUES (?, ?)",
+                               (save_id, blob))
+
+    def get(self, filename):
+        """The save data stored under filename (KeyError if there is none)"""
+        row = self.connection().execute(
+            "SELECT data FROM payloads JOIN saves ON saves.id = payloads.save_id WHERE filename = ?",
+            (filename,)).fetchone()
+        if row is None:
+            raise KeyError(filename)
+        return decompress_save(row[0])
+
+    def delete(self, filename):
+        """Remove a save; returns False if there was none"""
+        connection = self.connection()
+        with connection:
+            return connection.execute("DELETE FROM saves WHERE filename = ?", (filename,)).rowcount > 0
+
+    def __contains__(self, filename):
+        return self.connection().execute(
+            "SELECT 1 FROM saves WHERE filename = ?", (filename,)).fetchone() is not None
+
+    def stamps(self):
+        """{filename: mtime_ns} of every save, the store's stand-in for file mtimes"""
+        return dict(self.connection().execute("SELECT filename, mtime_ns FROM saves"))
+
+    def query(self, character=None, order='timestamp', descending=True, limit=None):
+        """Save infos (as SaveManager.save_info gives them, plus mtime_ns), filtered and
+        sorted by the indexed columns; no game data is read"""
+        sql = f"SELECT filename, {', '.join(COLUMNS)}, mtime_ns FROM saves"
+        parameters = []
+        if character is not None:
+            sql += " WHERE character_name = ?"
+            parameters.append(character)
+        sql += f" ORDER BY {ORDERS[order]} {'DESC' if descending else 'ASC'}, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            parameters.append(limit)
+        infos = []
+        for filename, *values, mtime_ns in self.connection().execute(sql, parameters):
+            info = {'filename': filename, 'filepath': os.path.join(self.save_directory, filename)}
+            info.update(zip(COLUMNS, values))
+            info['mtime_ns'] = mtime_ns
+            infos.append(info)
+        return infos
+
+    def import_json(self, filepaths, save_manager):
+        """Copy JSON save files into the store; returns the filenames imported"""
+        imported = []
+        for filepath in filepaths:
+            filename = os.path.basename(filepath)
+            try:
+                with open(filepath, 'r') as f:
+                    save_data = json.load(f)
+                info = save_manager.save_info(filename, save_data)
+            except (OSError, ValueError, KeyError):
+                continue
+            self.put(filename, save_data, info)
+            imported.append(filename)
+        return imported
+
+    def export_json(self, directory, filenames=None):
+        """Write saves out as JSON files SaveManager can load; returns the paths written"""
+        from save_manager import SaveManager
+        json_manager = SaveManager(directory, backend='json')
+        if filenames is None:
+            filenames = [info['filename'] for info in self.query()]
+        written = []
+        for filename in filenames:
+            filepath = os.path.join(directory, filename)
+            success, _ = json_manager.write_save(filepath, self.get(filename))
+            if success:
+                written.append(filepath)
+        return written
+
+def benchmark(count):
+    """Time listing and querying a store holding count saves of a real game"""
+    import random
+    import tempfile
+    import pygame
+    from game_engine import GameEngine
+    from save_manager import SaveManager
+
+    pygame.font.init()
+    engine = GameEngine(seed=1, autosave_slots=0, headless=True)
+    with tempfile.TemporaryDirectory() as directory:
+        save_manager = SaveManager(directory, backend='sqlite')
+        store = save_manager.store
+        save_data = save_manager.build_save_data(engine)
+        start = time.perf_counter()
+        names = ['Hero', 'Aria', 'Brom', 'Cade', 'Dara']
+        for number in range(count):
+            save_data['character_name'] = random.choice(names)
+            save_data['max_dungeon_level'] = random.randint(1, 60)
+            save_data['player_gold'] = random.randint(0, 5000)
+            filename = f"save_{number:05d}.json"
+            store.put(filename, save_data, save_manager.save_info(filename, save_data))
+        print(f"Inserted {count} saves in {time.perf_counter() - start:.2f}s "
+              f"({len(compress_save(save_data)) / 1024:.1f} KiB each, "
+              f"{len(json.dumps(save_data, indent=2)) / 1024:.1f} KiB as a JSON file)")
+
+        for label, run in (
+            ("list all, newest first", lambda: store.query()),
+            ("10 deepest runs", lambda: store.query(order='depth', limit=10)),
+            ("one character's saves", lambda: store.query(character='Aria')),
+            ("richest 10 of a character", lambda: store.query(character='Aria', order='gold', limit=10)),
+            ("load one save", lambda: store.get(f"save_{count // 2:05d}.json")),
+        ):
+            runs = 20
+            start = time.perf_counter()
+            for _ in range(runs):
+                result = run()
+            elapsed = (time.perf_counter() - start) / runs * 1000
+            size = len(result) if isinstance(result, list) else 1
+            print(f"  {label:<28} {elapsed:8.2f} ms  ({size} rows)")
+        store.close()
+
+def main():
+    import argparse
+    from save_manager import SaveManager
+    parser = argparse.ArgumentParser(description="Manage the SQLite save store")
+    parser.add_argument('--db', default=os.path.join('saves', DATABASE_FILENAME))
+    commands = parser.add_subparsers(dest='command', required=True)
+    import_parser = commands.add_parser('import', help="copy JSON saves into the store")
+    import_parser.add_argument('files', nargs='+')
+    export_parser = commands.add_parser('export', help="write saves out as JSON files")
+    export_parser.add_argument('directory')
+    export_parser.add_argument('filenames', nargs='*')
+    list_parser = commands.add_parser('list', help="list saves")
+    list_parser.add_argument('--character')
+    list_parser.add_argument('--order', choices=sorted(ORDERS), default='timestamp')
+    list_parser.add_argument('--ascending', action='store_true')
+    list_parser.add_argument('--limit', type=int)
+    bench_parser = commands.add_parser('bench', help="time queries on a store of generated saves")
+    bench_parser.add_argument('--count', type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.command == 'bench':
+        benchmark(args.count)
+        return 0
+    # The JSON manager only supplies save_info; it also creates the directory
+    save_manager = SaveManager(os.path.dirname(args.db) or '.', backend='json')
+    store = SaveStore(args.db)
+    if args.command == 'import':
+        imported = store.import_json(args.files, save_manager)
+        print(f"Imported {len(imported)} of {len(args.files)} saves into {args.db}")
+    elif args.command == 'export':
+        os.makedirs(args.directory, exist_ok=True)
+        written = store.export_json(args.directory, args.filenames or None)
+        print(f"Exported {len(written)} saves to {args.directory}")
+    else:
+        for info in store.query(args.character, args.order, not args.ascending, args.limit):
+            print(f"{info['filename']:<32} {info['character_name']:<16} level {info['level']:>3}  "
+                  f"depth {info['dungeon_level']:>3} (deepest {info['max_dungeon_level']:>3})  "
+                  f"gold {info['gold']:>6}  {info['timestamp']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
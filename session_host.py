@@ -0,0 +1,430 @@
+"""
+Session host: many headless game sessions in one process.
+
+Clients talk to the host over TCP on localhost (or a Unix socket) with
+newline-delimited JSON requests, each answered by one JSON line:
+
+    {"op": "create", "seed": 7, "width": 80, "height": 50}
+        -> {"ok": true, "session": "3f9c...", "state": {...full snapshot...}}
+    {"op": "act", "session": "3f9c...", "commands": [["key", 1073741906], ["run", 104], ["travel", [10, 4]]],
+     "mode": "delta"}
+        -> {"ok": true, "session": "3f9c...", "state": {...changes since the last response...}}
+    {"op": "state", "session": "3f9c...", "mode": "snapshot"}
+    {"op": "close", "session": "3f9c..."}
+    {"op": "stats"}
+        -> {"ok": true, "stats": {"resident": .., "evicted": .., "turns": .., "turns_per_cpu_second": ..}}
+
+Each session has its own random state: the host swaps it into the random
+module whenever the session runs, so a session's seed reproduces its game
+however many other sessions share the process.
+
+Commands are the same tuples GameEngine.execute takes (["ctrl", key] for a
+key pressed with Ctrl held). Each session runs its commands in order from its
+own queue. Sessions idle for longer than the idle timeout (or beyond the
+resident limit) are saved to disk with SaveManager, in the session's own slot,
+and dropped from memory. The next request for them loads them back. The host
+does all the saving, so the Ctrl+S quick save is turned off in sessions.
+
+Usage: python session_host.py [--port 8765 | --unix PATH] [--idle-timeout 300]
+       python session_host.py --bench 50 [--turns 200]
+"""
+
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+
+from cell_encoding import changed_cells, known_cells, pack_cells
+
+HOST = '127.0.0.1'
+PORT = 8765
+SESSION_DIRECTORY = 'sessions'  # evicted sessions, one save file each
+IDLE_TIMEOUT = 300  # seconds without requests before a session is evicted
+MAX_RESIDENT = 256  # sessions kept in memory; the least recently used go first
+EVICTION_INTERVAL = 5  # seconds between idle checks
+MAX_LINE = 2 ** 20  # longest request/response line in bytes
+
+class StateEncoder:
+    """Encodes what a client can see of a game, either as a full snapshot or
+    as the changes since the last state this encoder produced."""
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Forget what was sent; the next delta is a full snapshot"""
+        self.game_map = None
+        self.cells = None
+        self.fields = {}
+        self.message_seq = 0
+
+    def _fields(self, engine):
+        player = engine.player
+        game_map = engine.game_map
+        return {
+            'turn': engine.turns,
+            'depth': engine.dungeon_level,
+            'game_state': engine.game_state,
+            'player': [player.x, player.y, player.hp, player.max_hp, player.level,
+                       player.exp, player.gold],
+            'enemies': [[enemy.x, enemy.y, enemy.char, enemy.hp] for enemy in game_map.enemies],
+            'items': [[item.x, item.y, item.char] for item in game_map.items],
+            'exits': [game_map.stairs_down, game_map.stairs_up, game_map.special_portal],
+        }
+
+    def snapshot(self, engine):
+        from game_map import TILE_TYPES
+        game_map = engine.game_map
+        self.game_map = game_map
+        self.cells = known_cells(game_map)
+        self.fields = self._fields(engine)
+        self.message_seq = engine.message_log.last_seq
+        state = dict(self.fields)
+        state['full'] = True
+        state['map'] = {
+            'width': game_map.width,
+            'height': game_map.height,
+            'palette': [[tile_type.name, tile_type.char, list(tile_type.color)] for tile_type in TILE_TYPES],
+            'cells': pack_cells(self.cells),
+        }
+        state['messages'] = engine.message_log.messages()
+        return state
+
+    def delta(self, engine):
+        """Only the fields and cells that changed; a full snapshot after a level change"""
+        if engine.game_map is not self.game_map:
+            return self.snapshot(engine)
+        state = {'full': False}
+        fields = self._fields(engine)
+        for name, value in fields.items():
+            if self.fields.get(name) != value:
+                state[name] = value
+        self.fields = fields
+
+        cells = known_cells(engine.game_map)
+        if cells != self.cells:
+            state['cells'] = [[index, cells[index]] for index in changed_cells(self.cells, cells)]
+            self.cells = cells
+
+        entries = engine.message_log.since(self.message_seq)
+        if entries:
+            state['messages'] = [text for _, text in entries]
+            self.message_seq = entries[-1][0]
+        return state
+
+class Session:
+    def __init__(self, session_id, engine=None):
+        self.id = session_id
+        self.engine = engine  # None while evicted
+        self.random_state = None  # the session's random.getstate() while it isn't running
+        self.encoder = StateEncoder()
+        self.queue = asyncio.Queue()  # (commands, mode, future)
+        self.last_active = time.monotonic()
+        self.busy = False  # running commands (possibly paused between two of them)
+        self.task = None
+
+    def idle(self):
+        return not self.busy and self.queue.empty()
+
+class SessionHost:
+    def __init__(self, save_directory=SESSION_DIRECTORY, idle_timeout=IDLE_TIMEOUT,
+                 max_resident=MAX_RESIDENT):
+        from save_manager import SaveManager
+        self.save_manager = SaveManager(save_directory)
+        self.idle_timeout = idle_timeout
+        self.max_resident = max_resident
+        self.sessions = {}
+        self.turns = 0
+        self.evictions = 0
+        self.started_cpu = time.process_time()
+
+    # --- sessions ---
+
+    def _new_engine(self, width=80, height=50, seed=None):
+        from game_engine import GameEngine
+        engine = GameEngine(width, height, seed=seed, autosave_slots=0, headless=True)
+        # Sessions are saved by the host, into their own slot; a quick save into
+        # one shared slot would let clients overwrite each other's games
+        engine._save_manager = self.save_manager
+        engine.quick_save_slot = None
+        return engine
+
+    @contextmanager
+    def _random_of(self, session):
+        """Run the block with the session's own state in the random module.
+        The engine and the level generators all draw from random, and sessions
+        take turns on one thread, so each keeps its state here in between."""
+        outer = random.getstate()
+        if session.random_state is not None:
+            random.setstate(session.random_state)
+        try:
+            yield
+        finally:
+            session.random_state = random.getstate()
+            random.setstate(outer)
+
+    def _save_path(self, session_id):
+        return self.save_manager.slot_path(f"session_{session_id}")
+
+    async def create(self, seed=None, width=80, height=50):
+        session = Session(uuid.uuid4().hex[:12])
+        # The engine seeds random itself; the state it leaves becomes the session's
+        with self._random_of(session):
+            session.engine = self._new_engine(width, height, seed)
+        self._start(session)
+        self._enforce_resident_limit()
+        return session, session.encoder.snapshot(session.engine)
+
+    def _start(self, session):
+        self.sessions[session.id] = session
+        session.task = asyncio.ensure_future(self._run_session(session))
+
+    def get(self, session_id):
+        """A resident session, or an evicted one loaded back from disk"""
+        session = self.sessions.get(session_id)
+        if session is None:
+            if not isinstance(session_id, str) or not session_id.isalnum():
+                raise KeyError(session_id)
+            if not self.save_manager.save_exists(self._save_path(session_id)):
+                raise KeyError(session_id)
+            session = Session(session_id)
+            self._start(session)
+        session.last_active = time.monotonic()
+        if session.engine is None:
+            self._restore(session)
+            self._enforce_resident_limit()
+        return session
+
+    def _restore(self, session):
+        success, save_data = self.save_manager.load_game(self._save_path(session.id))
+        if not success:
+            raise KeyError(save_data)
+        # The placeholder engine's level generation mustn't touch any session's random state
+        outer = random.getstate()
+        engine = self._new_engine()
+        random.setstate(outer)
+        engine.restore_save(save_data)
+        state = save_data.get('random_state')
+        if state is not None:
+            # JSON turned the state's tuples into lists
+            session.random_state = (state[0], tuple(state[1]), state[2])
+        elif session.random_state is None:
+            session.random_state = random.Random(session.id).getstate()
+        session.engine = engine
+        session.encoder.reset()
+
+    def evict(self, session):
+        """Save a session to disk and drop its engine from memory"""
+        if session.engine is None:
+            return
+        engine = session.engine
+        engine.update_playtime()
+        save_data = self.save_manager.build_save_data(engine, f"Session {session.id}")
+        save_data['random_state'] = session.random_state
+        self.save_manager.write_save(self._save_path(session.id), save_data)
+        session.engine = None
+        session.encoder.reset()
+        self.evictions += 1
+
+    def close(self, session_id):
+        session = self.sessions.pop(session_id, None)
+        if session is not None:
+            session.task.cancel()
+            # Callers still waiting on the session get the answer for an unknown session
+            while not session.queue.empty():
+                _, _, future = session.queue.get_nowait()
+                if not future.done():
+                    future.set_exception(KeyError(session_id))
+        elif not isinstance(session_id, str) or not session_id.isalnum():
+            raise KeyError(session_id)
+        self.save_manager.delete_save(self._save_path(session_id))
+
+    def _enforce_resident_limit(self):
+        resident = [session for session in self.sessions.values() if session.engine is not None]
+        resident.sort(key=lambda session: session.last_active)
+        for session in resident[:max(0, len(resident) - self.max_resident)]:
+            if session.idle():
+                self.evict(session)
+
+    async def evict_idle(self):
+        while True:
+            await asyncio.sleep(EVICTION_INTERVAL)
+            now = time.monotonic()
+            for session in list(self.sessions.values()):
+                if (session.engine is not None and session.idle()
+                        and now - session.last_active > self.idle_timeout):
+                    self.evict(session)
+
+    async def _run_session(self, session):
+        """Run one session's queued commands in order"""
+        while True:
+            commands, mode, future = await session.queue.get()
+            session.busy = True
+            try:
+                engine = session.engine
+                turns = engine.turns
+                for command in commands:
+                    kind, arg = command
+                    with self._random_of(session):
+                        engine.execute((kind, tuple(arg) if kind == 'travel' else arg))
+                    # Let other sessions run between commands
+                    await asyncio.sleep(0)
+                encoder = session.encoder
+                state = encoder.snapshot(engine) if mode == 'snapshot' else encoder.delta(engine)
+                self.turns += engine.turns - turns
+                future.set_result(state)
+            except asyncio.CancelledError:
+                # Closed while running the commands (see close)
+                if not future.done():
+                    future.set_exception(KeyError(session.id))
+                raise
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                session.busy = False
+
+    async def act(self, session_id, commands, mode='delta'):
+        session = self.get(session_id)
+        future = asyncio.get_running_loop().create_future()
+        await session.queue.put((commands, mode, future))
+        state = await future
+        session.last_active = time.monotonic()
+        return session, state
+
+    def stats(self):
+        cpu = time.process_time() - self.started_cpu
+        resident = sum(session.engine is not None for session in self.sessions.values())
+        return {
+            'resident': resident,
+            'evicted': len(self.sessions) - resident,
+            'evictions': self.evictions,
+            'turns': self.turns,
+            'cpu_seconds': round(cpu, 3),
+            # The host runs on one thread, so this is the per-core rate
+            'turns_per_cpu_second': round(self.turns / cpu, 1) if cpu else 0,
+        }
+
+    # --- protocol ---
+
+    async def handle_request(self, request):
+        op = request.get('op')
+        if op == 'create':
+            session, state = await self.create(request.get('seed'), request.get('width', 80),
+                                               request.get('height', 50))
+            return {'ok': True, 'session': session.id, 'state': state}
+        if op == 'act':
+            session, state = await self.act(request['session'], request.get('commands', []),
+                                            request.get('mode', 'delta'))
+            return {'ok': True, 'session': session.id, 'state': state}
+        if op == 'state':
+            session, state = await self.act(request['session'], [], request.get('mode', 'snapshot'))
+            return {'ok': True, 'session': session.id, 'state': state}
+        if op == 'close':
+            self.close(request['session'])
+            return {'ok': True}
+        if op == 'stats':
+            return {'ok': True, 'stats': self.stats()}
+        return {'ok': False, 'error': f"Unknown op: {op}"}
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = await self.handle_request(json.loads(line))
+                except KeyError as e:
+                    response = {'ok': False, 'error': f"Unknown session or field: {e}"}
+                except (ValueError, TypeError) as e:
+                    response = {'ok': False, 'error': f"Bad request: {e}"}
+                except Exception as e:
+                    # A failing command must not take the connection down with it
+                    response = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+                writer.write(json.dumps(response, separators=(',', ':')).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host=HOST, port=PORT, path=None):
+        """Start listening; returns the asyncio server"""
+        asyncio.ensure_future(self.evict_idle())
+        if path:
+            return await asyncio.start_unix_server(self.handle_client, path, limit=MAX_LINE)
+        return await asyncio.start_server(self.handle_client, host, port, limit=MAX_LINE)
+
+async def request(reader, writer, message):
+    """Client helper: send one request and wait for its response"""
+    writer.write(json.dumps(message).encode() + b'\n')
+    await writer.drain()
+    return json.loads(await reader.readline())
+
+async def run_benchmark(sessions=50, turns=200):
+    """Drive many sessions with random moves over real localhost connections.
+    The clients run in the same process, so the per-core rate is a lower bound."""
+    import pygame
+    from game_engine import MOVEMENT_KEYS
+    host = SessionHost(idle_timeout=IDLE_TIMEOUT)
+    server = await host.start(port=0)
+    port = server.sockets[0].getsockname()[1]
+    keys = list(MOVEMENT_KEYS) + [pygame.K_PERIOD, pygame.K_x]
+
+    async def client(index):
+        reader, writer = await asyncio.open_connection(HOST, port, limit=MAX_LINE)
+        rng = random.Random(index)
+        created = await request(reader, writer, {'op': 'create', 'seed': index})
+        session_id = created['session']
+        for _ in range(turns):
+            response = await request(reader, writer, {'op': 'act', 'session': session_id,
+                                                      'commands': [['key', rng.choice(keys)]]})
+            if response['state'].get('game_state', 'playing') != 'playing':
+                await request(reader, writer, {'op': 'close', 'session': session_id})
+                created = await request(reader, writer, {'op': 'create'})
+                session_id = created['session']
+        writer.close()
+
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    await asyncio.gather(*(client(index) for index in range(sessions)))
+    wall, cpu = time.perf_counter() - start_wall, time.process_time() - start_cpu
+    server.close()
+    stats = host.stats()
+    print(f"{sessions} sessions x {turns} commands: {wall:.2f} s wall, {cpu:.2f} s CPU, "
+          f"{stats['turns']} game turns")
+    print(f"  {stats['turns'] / wall:.0f} turns/s wall, {stats['turns'] / cpu:.0f} turns per CPU-second (one core)")
+    print(f"  {sessions * turns / wall:.0f} requests/s across {sessions} concurrent sessions")
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Host many headless game sessions")
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--unix', help="listen on this Unix socket path instead of TCP")
+    parser.add_argument('--idle-timeout', type=float, default=IDLE_TIMEOUT)
+    parser.add_argument('--max-resident', type=int, default=MAX_RESIDENT)
+    parser.add_argument('--bench', type=int, metavar='SESSIONS', help="run the throughput benchmark")
+    parser.add_argument('--turns', type=int, default=200, help="commands per session for --bench")
+    args = parser.parse_args()
+
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    if args.bench:
+        asyncio.run(run_benchmark(args.bench, args.turns))
+        return 0
+
+    async def serve():
+        host = SessionHost(idle_timeout=args.idle_timeout, max_resident=args.max_resident)
+        server = await host.start(port=args.port, path=args.unix)
+        print(f"Session host listening on {args.unix or f'{HOST}:{args.port}'}")
+        async with server:
+            await server.serve_forever()
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,451 @@
+"""
+Spectator stream: watch a game live, or record it cheaply.
+
+A SpectatorStream attached to a GameEngine encodes what the player can see
+after every turn and sends it to any number of viewers over TCP on
+localhost (or a Unix socket), one JSON object per line:
+
+    {"type": "keyframe", "turn": 0, "depth": 1, "map": {"width": .., "height": ..,
+     "palette": [[name, char, [r, g, b]], ...], "cells": "<zlib+base64>"},
+     "player": [x, y, hp, max_hp, level, exp, gold], "state": "playing",
+     "exits": [[x, y] | null, ...], "enemies": [[id, x, y, char, [r, g, b], hp, max_hp], ...],
+     "items": [[x, y, char, [r, g, b]], ...], "messages": [...]}
+    {"type": "delta", "turn": 12, "cells": [index, value, index, value, ...],
+     "player": [...], "moves": [[id, x, y], ...], "spawns": [[id, x, y, char, [r, g, b], hp, max_hp], ...],
+     "hides": [id, ...], "deaths": [id, ...], "hp": [[id, hp], ...],
+     "items_add": [[x, y, char, [r, g, b]], ...], "items_del": [[x, y], ...], "messages": [...]}
+
+A cell value is the tile id (an index into the palette), plus VISIBLE_BIT
+while the player can see it, or UNKNOWN_CELL if it's unexplored. Deltas only
+carry the keys that changed, so their size follows what happened in the
+turn rather than the size of the map. Enemies and items are sent only while
+they are in view, like the game draws them. A keyframe starts every level,
+every loaded game and every KEYFRAME_INTERVAL events; a viewer that joins
+mid-stream is sent the last keyframe and the deltas since.
+
+Usage: python spectator.py [--port 8766 | --unix PATH] [--save FILE]   watch a live game
+       python spectator.py --play FILE [--delay 0.05] [--stats]        replay a saved stream
+Start the game with ROGUELIKE_SPECTATE=8766 (or a socket path) to serve it.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from collections import deque
+
+from cell_encoding import UNKNOWN_CELL, changed_cells, known_cells, pack_cells, unpack_cells
+
+HOST = '127.0.0.1'
+PORT = 8766
+SPECTATE_ENV = 'ROGUELIKE_SPECTATE'  # port number or Unix socket path to serve the GUI's game on
+KEYFRAME_INTERVAL = 200  # events between keyframes
+MAX_BUFFERED = 2 ** 20  # bytes queued for a viewer before it's skipped until the next keyframe
+VISIBLE_BIT = 0x80
+
+def view_cells(game_map):
+    """known_cells with VISIBLE_BIT set on the cells the player sees now"""
+    count = len(game_map.tile_types)
+    visible = int.from_bytes(game_map.visible.translate(bytes([0]) + bytes([VISIBLE_BIT]) * 255), 'big')
+    return (int.from_bytes(known_cells(game_map), 'big') | visible).to_bytes(count, 'big')
+
+class SpectatorEncoder:
+    """Turns successive engine states into keyframe and delta events.
+    Enemies get small ids for the life of a keyframe, so a viewer can follow
+    them between deltas."""
+    def __init__(self, keyframe_interval=KEYFRAME_INTERVAL):
+        self.keyframe_interval = keyframe_interval
+        self.reset()
+
+    def reset(self):
+        """The next event is a keyframe"""
+        self.game_map = None
+        self.log_generation = None
+        # What the last event left the viewer with (set by keyframe, updated by delta)
+        self.message_seq = 0
+        self.turn = 0
+        self.cells = None
+        self.player = None
+        self.state = None
+        self.enemies = {}  # id -> (enemy, [x, y, hp])
+        self.items = {}  # (x, y) -> (char, color)
+        self.events = 0
+        self.next_id = 1
+        self.enemy_ids = {}  # enemy -> id, for every enemy seen since the keyframe
+
+    def _enemy_id(self, enemy):
+        enemy_id = self.enemy_ids.get(enemy)
+        if enemy_id is None:
+            enemy_id = self.enemy_ids[enemy] = self.next_id
+            self.next_id += 1
+        return enemy_id
+
+    def _in_view(self, engine):
+        """Enemies {id: [x, y, hp]} and items {(x, y): [char, color]} the player can see"""
+        game_map = engine.game_map
+        visible, height = game_map.visible, game_map.height
+        enemies = {self._enemy_id(enemy): (enemy, [enemy.x, enemy.y, enemy.hp])
+                   for enemy in game_map.enemies if visible[enemy.x * height + enemy.y]}
+        items = {(item.x, item.y): (item.char, list(item.color))
+                 for item in game_map.items if visible[item.x * height + item.y]}
+        return enemies, items
+
+    def _player(self, engine):
+        player = engine.player
+        return [player.x, player.y, player.hp, player.max_hp, player.level, player.exp, player.gold]
+
+    def encode(self, engine):
+        """The event for the engine's current state, or None if nothing changed"""
+        if (engine.game_map is not self.game_map
+                or engine.message_log.generation != self.log_generation
+                or self.events >= self.keyframe_interval):
+            return self.keyframe(engine)
+        event = self.delta(engine)
+        if event is not None:
+            self.events += 1
+        return event
+
+    def keyframe(self, engine):
+        from game_map import TILE_TYPES
+        if len(TILE_TYPES) > VISIBLE_BIT:
+            raise ValueError("Too many tile types for the spectator cell encoding")
+        self.reset()
+        game_map = engine.game_map
+        self.game_map = game_map
+        self.log_generation = engine.message_log.generation
+        self.message_seq = engine.message_log.last_seq
+        self.turn = engine.turns
+        self.cells = view_cells(game_map)
+        self.player = self._player(engine)
+        self.state = engine.game_state
+        self.enemies, self.items = self._in_view(engine)
+        return {
+            'type': 'keyframe',
+            'turn': engine.turns,
+            'depth': engine.dungeon_level,
+            'map': {
+                'width': game_map.width,
+                'height': game_map.height,
+                'palette': [[tile_type.name, tile_type.char, list(tile_type.color)] for tile_type in TILE_TYPES],
+                'cells': pack_cells(self.cells),
+            },
+            'player': self.player,
+            'state': self.state,
+            'exits': [game_map.stairs_down, game_map.stairs_up, game_map.special_portal],
+            'enemies': [[enemy_id, x, y, enemy.char, list(enemy.color), hp, enemy.max_hp]
+                        for enemy_id, (enemy, (x, y, hp)) in self.enemies.items()],
+            'items': [[x, y, char, color] for (x, y), (char, color) in self.items.items()],
+            'messages': engine.message_log.messages(),
+        }
+
+    def delta(self, engine):
+        event = {}
+        cells = view_cells(engine.game_map)
+        if cells != self.cells:
+            flat = []
+            for index in changed_cells(self.cells, cells):
+                flat += (index, cells[index])
+            event['cells'] = flat
+            self.cells = cells
+
+        player = self._player(engine)
+        if player != self.player:
+            event['player'] = self.player = player
+        if engine.game_state != self.state:
+            event['state'] = self.state = engine.game_state
+
+        enemies, items = self._in_view(engine)
+        moves, spawns, hurt = [], [], []
+        for enemy_id, (enemy, (x, y, hp)) in enemies.items():
+            seen = self.enemies.get(enemy_id)
+            if seen is None:
+                spawns.append([enemy_id, x, y, enemy.char, list(enemy.color), hp, enemy.max_hp])
+                continue
+            old_x, old_y, old_hp = seen[1]
+            if (x, y) != (old_x, old_y):
+                moves.append([enemy_id, x, y])
+            if hp != old_hp:
+                hurt.append([enemy_id, hp])
+        gone = [(enemy_id, enemy) for enemy_id, (enemy, _) in self.enemies.items() if enemy_id not in enemies]
+        if gone:
+            alive = set(engine.game_map.enemies)
+            deaths = [enemy_id for enemy_id, enemy in gone if enemy not in alive]
+            hides = [enemy_id for enemy_id, enemy in gone if enemy in alive]
+            if deaths:
+                event['deaths'] = deaths
+            if hides:
+                event['hides'] = hides
+        for key, value in (('moves', moves), ('spawns', spawns), ('hp', hurt)):
+            if value:
+                event[key] = value
+        self.enemies = enemies
+
+        if items != self.items:
+            added = [[x, y, char, color] for (x, y), (char, color) in items.items()
+                     if self.items.get((x, y)) != (char, color)]
+            removed = [[x, y] for (x, y) in self.items if (x, y) not in items]
+            if added:
+                event['items_add'] = added
+            if removed:
+                event['items_del'] = removed
+            self.items = items
+
+        entries = engine.message_log.since(self.message_seq)
+        if entries:
+            event['messages'] = [text for _, text in entries]
+            self.message_seq = entries[-1][0]
+
+        if not event and engine.turns == self.turn:
+            return None
+        self.turn = engine.turns
+        event['type'] = 'delta'
+        event['turn'] = engine.turns
+        return event
+
+class SpectatorStream:
+    """Serves a game's events to viewers from a background thread.
+    publish() is called on the game thread (GameEngine does it after every
+    turn); encoding happens there, and the finished line is handed to the
+    server's event loop, which writes it to every connected viewer."""
+    def __init__(self, host=HOST, port=PORT, path=None, record_path=None,
+                 keyframe_interval=KEYFRAME_INTERVAL):
+        self.encoder = SpectatorEncoder(keyframe_interval)
+        self.record = open(record_path, 'ab') if record_path else None
+        self.viewers = {}  # writer -> True while it's waiting for a keyframe
+        self.backlog = []  # the last keyframe and the deltas since, for new viewers
+        self.events = 0
+        self.bytes = 0
+        self.loop = asyncio.new_event_loop()
+        self.server = self.loop.run_until_complete(
+            asyncio.start_unix_server(self._handle_viewer, path) if path
+            else asyncio.start_server(self._handle_viewer, host, port))
+        self.address = path or self.server.sockets[0].getsockname()[:2]
+        self.thread = threading.Thread(target=self.loop.run_forever, name="spectator", daemon=True)
+        self.thread.start()
+
+    def publish(self, engine):
+        event = self.encoder.encode(engine)
+        if event is None:
+            return
+        line = json.dumps(event, separators=(',', ':')).encode() + b'\n'
+        self.events += 1
+        self.bytes += len(line)
+        if self.record is not None:
+            self.record.write(line)
+        self.loop.call_soon_threadsafe(self._broadcast, line, event['type'] == 'keyframe')
+
+    def _broadcast(self, line, keyframe):
+        if keyframe:
+            self.backlog = []
+        self.backlog.append(line)
+        for writer, waiting in list(self.viewers.items()):
+            if writer.transport.get_write_buffer_size() > MAX_BUFFERED:
+                # Too slow to keep up: skip deltas until it can take a fresh keyframe
+                self.viewers[writer] = True
+            elif keyframe or not waiting:
+                self.viewers[writer] = False
+                writer.write(line)
+
+    async def _handle_viewer(self, reader, writer):
+        self.viewers[writer] = False
+        writer.writelines(self.backlog)
+        try:
+            await reader.read()  # viewers don't send anything; wait for them to leave
+        except ConnectionError:
+            pass
+        finally:
+            self.viewers.pop(writer, None)
+            writer.close()
+
+    def close(self):
+        def shutdown():
+            self.server.close()
+            for task in asyncio.all_tasks(self.loop):
+                task.cancel()
+            # Stop once the cancelled viewer handlers have run their cleanup
+            self.loop.call_soon(self.loop.stop)
+        self.loop.call_soon_threadsafe(shutdown)
+        self.thread.join()
+        if self.record is not None:
+            self.record.close()
+            self.record = None
+
+def stream_from_env():
+    """A SpectatorStream on the port or socket path in ROGUELIKE_SPECTATE, if set"""
+    address = os.environ.get(SPECTATE_ENV)
+    if not address:
+        return None
+    if address.isdigit():
+        return SpectatorStream(port=int(address))
+    return SpectatorStream(path=address)
+
+class SpectatorView:
+    """Viewer-side copy of the game rebuilt from the events"""
+    def __init__(self, message_lines=5):
+        self.synced = False
+        self.messages = deque(maxlen=message_lines)
+
+    def apply(self, event):
+        if event['type'] == 'keyframe':
+            game_map = event['map']
+            self.width, self.height = game_map['width'], game_map['height']
+            self.palette = game_map['palette']
+            self.cells = unpack_cells(game_map['cells'])
+            self.depth = event['depth']
+            self.exits = [tuple(position) for position in event['exits'] if position]
+            self.enemies = {enemy[0]: enemy[1:] for enemy in event['enemies']}
+            self.items = {(x, y): (char, color) for x, y, char, color in event['items']}
+            self.player = event['player']
+            self.state = event['state']
+            self.messages.clear()
+            self.messages.extend(event['messages'])
+            self.synced = True
+        elif not self.synced:
+            return
+        else:
+            cells = event.get('cells', ())
+            for position in range(0, len(cells), 2):
+                self.cells[cells[position]] = cells[position + 1]
+            self.player = event.get('player', self.player)
+            self.state = event.get('state', self.state)
+            for enemy_id, *enemy in event.get('spawns', ()):
+                self.enemies[enemy_id] = enemy
+            for enemy_id, x, y in event.get('moves', ()):
+                self.enemies[enemy_id][0:2] = (x, y)
+            for enemy_id, hp in event.get('hp', ()):
+                self.enemies[enemy_id][4] = hp
+            for enemy_id in [*event.get('deaths', ()), *event.get('hides', ())]:
+                self.enemies.pop(enemy_id, None)
+            for x, y, char, color in event.get('items_add', ()):
+                self.items[(x, y)] = (char, color)
+            for x, y in event.get('items_del', ()):
+                self.items.pop((x, y), None)
+            self.messages.extend(event.get('messages', ()))
+        self.turn = event['turn']
+
+    def render(self, columns=80, rows=22, color=True):
+        """Text lines of the map around the player, then a status line and messages"""
+        if not self.synced:
+            return ["Waiting for a keyframe..."]
+        px, py = self.player[0], self.player[1]
+        x0 = max(0, min(px - columns // 2, self.width - columns))
+        y0 = max(0, min(py - rows // 2, self.height - rows))
+        glyphs = dict(self.items)
+        for x, y, char, enemy_color, hp, max_hp in self.enemies.values():
+            glyphs[(x, y)] = (char, enemy_color)
+        exit_chars = '><P'
+        lines = []
+        for y in range(y0, min(y0 + rows, self.height)):
+            line = []
+            for x in range(x0, min(x0 + columns, self.width)):
+                value = self.cells[x * self.height + y]
+                if (x, y) == (px, py):
+                    char, rgb = '@', (255, 255, 255)
+                elif value == UNKNOWN_CELL:
+                    line.append(' ')
+                    continue
+                elif (x, y) in glyphs and value & VISIBLE_BIT:
+                    char, rgb = glyphs[(x, y)]
+                elif (x, y) in self.exits:
+                    char, rgb = exit_chars[self.exits.index((x, y))], (255, 255, 0)
+                else:
+                    _, char, rgb = self.palette[value & ~VISIBLE_BIT]
+                if color:
+                    if not value & VISIBLE_BIT:
+                        rgb = [channel // 2 for channel in rgb]
+                    line.append(f"\x1b[38;2;{rgb[0]};{rgb[1]};{rgb[2]}m{char}")
+                else:
+                    line.append(char)
+            lines.append(''.join(line) + ("\x1b[0m" if color else ''))
+        x, y, hp, max_hp, level, exp, gold = self.player
+        lines.append(f"Depth {self.depth}  Turn {self.turn}  HP {hp}/{max_hp}  "
+                     f"Level {level}  Gold {gold}  [{self.state}]")
+        lines.extend(self.messages)
+        return lines
+
+def read_events(lines):
+    for line in lines:
+        if line.strip():
+            yield json.loads(line)
+
+def connect(port=PORT, path=None):
+    """Open a live stream; returns a binary file of event lines"""
+    if path:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(path)
+    else:
+        sock = socket.create_connection((HOST, port))
+    return sock.makefile('rb')
+
+def watch(lines, save=None, delay=0, color=True, max_fps=30):
+    """Draw a stream in the terminal as it arrives (or with delay between events)"""
+    view = SpectatorView()
+    def draw():
+        sys.stdout.write("\x1b[H\x1b[2J" + '\n'.join(view.render(color=color)) + '\n')
+        sys.stdout.flush()
+    shown = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        if save is not None:
+            save.write(line)
+        view.apply(json.loads(line))
+        now = time.monotonic()
+        if delay or now - shown >= 1 / max_fps:
+            shown = now
+            draw()
+        if delay:
+            time.sleep(delay)
+    draw()
+    return view
+
+def stream_stats(path):
+    """Count and average size of the keyframes and deltas in a saved stream"""
+    sizes = {'keyframe': [], 'delta': []}
+    with open(path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                sizes[json.loads(line)['type']].append(len(line))
+    for kind, values in sizes.items():
+        average = sum(values) / len(values) if values else 0
+        print(f"  {kind + 's':<10} {len(values):>6}  avg {average:8.1f} bytes  total {sum(values) / 1024:8.1f} KiB")
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Watch a live game or a saved spectator stream")
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--unix', help="connect to this Unix socket path instead of TCP")
+    parser.add_argument('--save', help="also append the live stream to this file")
+    parser.add_argument('--play', help="play a saved stream instead of connecting")
+    parser.add_argument('--delay', type=float, default=0.05, help="seconds between events with --play")
+    parser.add_argument('--stats', action='store_true', help="print the size of a saved stream's events")
+    parser.add_argument('--no-color', action='store_true')
+    args = parser.parse_args()
+
+    color = not args.no_color and sys.stdout.isatty()
+    try:
+        if args.play:
+            if args.stats:
+                stream_stats(args.play)
+                return 0
+            with open(args.play, 'rb') as f:
+                watch(f, delay=args.delay, color=color)
+            return 0
+        save = open(args.save, 'ab') if args.save else None
+        try:
+            watch(connect(args.port, args.unix), save=save, color=color)
+        finally:
+            if save is not None:
+                save.close()
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"Can't connect to the game: {e}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+"""
+Slow-turn watchdog: profiles of the turns that took too long.
+
+GameEngine runs commands, renders and save/load calls inside
+TurnWatchdog.watch. A call that takes longer than the threshold leaves a
+capture in the diagnostics directory. The capture holds what ran and the
+state it ran in: map size, dungeon level, enemy count, turn number, seed and
+the command. The newest KEEP_CAPTURES are kept.
+
+Two profilers are available:
+
+- 'sample' (the default) costs nothing between calls. While a call runs, a
+  background thread reads the engine thread's stack every SAMPLE_INTERVAL_MS
+  and counts the stacks it sees. The capture lists them in collapsed form
+  ("file:function;file:function count"), which flame graph tools read directly.
+- 'cprofile' runs cProfile around every watched call, slowing all of them
+  down, and saves the slow ones' stats as a .prof file next to the capture.
+
+Settings come from the environment: ROGUELIKE_SLOW_TURN_MS is the threshold
+(0 turns the watchdog off) and ROGUELIKE_SLOW_TURN_PROFILER picks the profiler.
+
+Usage: python turn_watchdog.py [DIRECTORY] [--last 3] [--top 15]   summarize the newest captures
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+SLOW_TURN_ENV = 'ROGUELIKE_SLOW_TURN_MS'
+PROFILER_ENV = 'ROGUELIKE_SLOW_TURN_PROFILER'
+DEFAULT_THRESHOLD_MS = 250
+PROFILERS = ('sample', 'cprofile')
+DIAGNOSTICS_DIRECTORY = 'diagnostics'
+KEEP_CAPTURES = 20
+SAMPLE_INTERVAL_MS = 2
+MAX_STACK_DEPTH = 64
+
+def collapse_stack(frame):
+    """'file:function;...' from the outermost frame to frame"""
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+class TurnWatchdog:
+    """Times watched calls and captures a profile of the slow ones"""
+    def __init__(self, threshold_ms=DEFAULT_THRESHOLD_MS, directory=DIAGNOSTICS_DIRECTORY,
+                 keep=KEEP_CAPTURES, profiler='sample'):
+        if profiler not in PROFILERS:
+            raise ValueError(f"Unknown profiler: {profiler}")
+        self.threshold = threshold_ms / 1000
+        self.directory = directory
+        self.keep = keep
+        self.profiler = profiler
+        self.active = None  # (thread id, stack counts) of the call being sampled
+        self.parts = None  # label -> seconds of nested watched calls
+        self.captures = 0
+        self.sampler = None  # started on the first sampled call
+        self.wake = threading.Event()
+        self.closed = False
+        self.setting_error = None  # what watchdog_from_env had to fall back from
+
+    @contextmanager
+    def watch(self, engine, label, command=None):
+        """Time the block as one watched call. A watched call inside another
+        (e.g. a quick save run by a key press) is reported as part of the
+        outer call's capture."""
+        if self.parts is not None:
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                self.parts[label] = self.parts.get(label, 0) + time.perf_counter() - start
+            return
+
+        self.parts = {}
+        stacks = profile = None
+        if self.profiler == 'cprofile':
+            import cProfile
+            profile = cProfile.Profile()
+            profile.enable()
+        else:
+            stacks = Counter()
+            self._start_sampler()
+            self.active = (threading.get_ident(), stacks)
+            self.wake.set()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.active = None
+            if profile is not None:
+                profile.disable()
+            parts, self.parts = self.parts, None
+            if elapsed >= self.threshold:
+                try:
+                    self.capture(engine, label, command, elapsed, parts, stacks, profile)
+                except OSError:
+                    pass  # diagnostics must never break the game
+
+    def _start_sampler(self):
+        if self.sampler is None:
+            self.sampler = threading.Thread(target=self._sample, name="turn-watchdog", daemon=True)
+            self.sampler.start()
+
+    def _sample(self):
+        interval = SAMPLE_INTERVAL_MS / 1000
+        while True:
+            self.wake.wait()
+            self.wake.clear()
+            if self.closed:
+                return
+            while True:
+                time.sleep(interval)
+                active = self.active
+                if active is None:
+                    break
+                thread_id, stacks = active
+                frame = sys._current_frames().get(thread_id)
+                if frame is not None:
+                    stacks[collapse_stack(frame)] += 1
+                del frame
+
+    def capture(self, engine, label, command, elapsed, parts, stacks, profile):
+        """Write one capture and drop the oldest beyond keep; returns its path"""
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"slow_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{label}"
+        game_map = engine.game_map
+        report = {
+            'label': label,
+            'command': list(command) if command is not None else None,
+            'elapsed_ms': round(elapsed * 1000, 2),
+            'threshold_ms': round(self.threshold * 1000, 2),
+            'parts_ms': {part: round(seconds * 1000, 2) for part, seconds in parts.items()},
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'seed': engine.seed,
+            'turn': engine.turns,
+            'dungeon_level': engine.dungeon_level,
+            'map_size': [game_map.width, game_map.height] if game_map else None,
+            'enemies': len(game_map.enemies) if game_map else 0,
+            'items': len(game_map.items) if game_map else 0,
+            'profiler': self.profiler,
+        }
+        if stacks is not None:
+            report['sample_interval_ms'] = SAMPLE_INTERVAL_MS
+            report['samples'] = sum(stacks.values())
+            report['stacks'] = [f"{stack} {count}" for stack, count in stacks.most_common()]
+        else:
+            report['profile'] = name + '.prof'
+            profile.dump_stats(os.path.join(self.directory, name + '.prof'))
+        with open(os.path.join(self.directory, name + '.json'), 'w') as f:
+            json.dump(report, f, indent=1)
+        self.captures += 1
+        self._rotate()
+        return os.path.join(self.directory, name + '.json')
+
+    def _rotate(self):
+        captures = sorted(name[:-5] for name in os.listdir(self.directory)
+                          if name.startswith('slow_') and name.endswith('.json'))
+        for name in captures[:max(0, len(captures) - self.keep)]:
+            for suffix in ('.json', '.prof'):
+                try:
+                    os.remove(os.path.join(self.directory, name + suffix))
+                except OSError:
+                    pass
+
+    def close(self):
+        self.closed = True
+        self.wake.set()
+        if self.sampler is not None:
+            self.sampler.join()
+            self.sampler = None
+
+def watchdog_from_env():
+    """A TurnWatchdog set up from ROGUELIKE_SLOW_TURN_MS and
+    ROGUELIKE_SLOW_TURN_PROFILER, or None when the threshold is 0.
+    Malformed settings fall back to the defaults, and the watchdog's
+    setting_error says so: diagnostics must never stop the game starting."""
+    errors = []
+    setting = os.environ.get(SLOW_TURN_ENV)
+    try:
+        threshold = float(setting or DEFAULT_THRESHOLD_MS)
+    except ValueError:
+        errors.append(f"{SLOW_TURN_ENV}={setting!r} is not a number, using {DEFAULT_THRESHOLD_MS} ms")
+        threshold = DEFAULT_THRESHOLD_MS
+    if threshold <= 0:
+        return None
+    profiler = os.environ.get(PROFILER_ENV) or 'sample'
+    if profiler not in PROFILERS:
+        errors.append(f"Unknown {PROFILER_ENV}={profiler!r}, using 'sample'")
+        profiler = 'sample'
+    watchdog = TurnWatchdog(threshold, profiler=profiler)
+    watchdog.setting_error = '; '.join(errors) or None
+    return watchdog
+
+def summarize(path, top):
+    """Print one capture: its context, then where the time went"""
+    with open(path) as f:
+        report = json.load(f)
+    print(f"{os.path.basename(path)}: {report['label']} {report['command'] or ''} took "
+          f"{report['elapsed_ms']:.0f} ms (threshold {report['threshold_ms']:.0f} ms)")
+    width, height = report['map_size'] or (0, 0)
+    print(f"  turn {report['turn']}, dungeon level {report['dungeon_level']}, map {width}x{height}, "
+          f"{report['enemies']} enemies, {report['items']} items, seed {report['seed']}")
+    for part, ms in report['parts_ms'].items():
+        print(f"  of which {part}: {ms:.0f} ms")
+    if report['profiler'] == 'cprofile':
+        import pstats
+        pstats.Stats(os.path.join(os.path.dirname(path), report['profile'])).sort_stats(
+            'cumulative').print_stats(top)
+        return
+    # Functions by share of samples, counting each function once per stack
+    samples = report['samples'] or 1
+    inclusive, own = Counter(), Counter()
+    for line in report['stacks']:
+        stack, count = line.rsplit(' ', 1)
+        frames = stack.split(';')
+        own[frames[-1]] += int(count)
+        for name in set(frames):
+            inclusive[name] += int(count)
+    print(f"  {report['samples']} samples every {report['sample_interval_ms']} ms")
+    print(f"  {'total':>6} {'self':>6}  function")
+    for name, count in inclusive.most_common(top):
+        print(f"  {count / samples:6.0%} {own[name] / samples:6.0%}  {name}")
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Summarize slow-turn captures")
+    parser.add_argument('directory', nargs='?', default=DIAGNOSTICS_DIRECTORY)
+    parser.add_argument('--last', type=int, default=3, help="how many of the newest captures to show")
+    parser.add_argument('--top', type=int, default=15, help="functions listed per capture")
+    args = parser.parse_args()
+    try:
+        names = sorted(name for name in os.listdir(args.directory)
+                       if name.startswith('slow_') and name.endswith('.json'))
+    except OSError:
+        names = []
+    if not names:
+        print(f"No captures in {args.directory}")
+        return 0
+    print(f"{len(names)} captures in {args.directory}")
+    for name in names[-args.last:]:
+        print()
+        summarize(os.path.join(args.directory, name), args.top)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())